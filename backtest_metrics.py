@@ -0,0 +1,72 @@
+"""
+Metrics sidecar of a backtest run: `<prefix>_backtest_metrics.json`.
+`run_backtest` writes every aggregate the report needs (overall detail means,
+the hit-day count, the per-source summary rows and the best/worst lookups),
+so `generate_backtest_report.py` renders without touching the detail rows.
+"""
+import json
+import os
+
+WORKDIR = os.path.dirname(__file__)
+
+# overall means over the detail rows, as shown in the report
+DETAIL_MEANS = ['Full_Hit', 'High_Miss', 'Low_Miss', 'High_Error', 'Low_Error', 'Total_Error']
+# (name, summary column, 'min'/'max') lookups shown in the report
+EXTREMES = [
+    ('best_error', 'Avg_Total_Error_pts', 'min'),
+    ('worst_error', 'Avg_Total_Error_pts', 'max'),
+    ('lowest_bias', 'Directional_Bias', 'min'),
+    ('highest_bias', 'Directional_Bias', 'max'),
+]
+
+
+def metrics_path(out_prefix):
+    return os.path.join(WORKDIR, f'{out_prefix}_backtest_metrics.json')
+
+
+def detail_metrics(detail_df):
+    """Overall means, row count and hit-day count of a scored detail frame."""
+    means = detail_df[DETAIL_MEANS].astype(float).mean()
+    hit_days = detail_df.loc[detail_df['Full_Hit'].astype(bool), 'Date'].nunique()
+    return dict(means.items(), n_rows=len(detail_df), hit_days=int(hit_days))
+
+
+def sums_metrics(sums, hit_days):
+    """`detail_metrics` from accumulated per-source sums (the streaming backtest)."""
+    n_rows = sums['N_Days'].sum()
+    return dict({c: float(sums[c].sum() / n_rows) for c in DETAIL_MEANS}, n_rows=int(n_rows), hit_days=int(hit_days))
+
+
+def build_metrics(summary_df, detail):
+    """Sidecar contents: `detail` aggregates plus the summary rows (in ranking order) and extremes."""
+    summary_df = summary_df.reset_index(drop=True)
+    extremes = {}
+    for name, col, how in EXTREMES:
+        i = summary_df[col].idxmin() if how == 'min' else summary_df[col].idxmax()
+        extremes[name] = {'Source': str(summary_df.loc[i, 'Source']), 'value': float(summary_df.loc[i, col])}
+    rows = summary_df.astype({'Source': str}).to_dict(orient='records')
+    return {'detail': {k: float(v) if k in DETAIL_MEANS else int(v) for k, v in detail.items()},
+            'sources': rows, 'extremes': extremes}
+
+
+def save_metrics(out_prefix, metrics):
+    path = metrics_path(out_prefix)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, indent=1)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_metrics(out_prefix, summary_file=None):
+    """The prefix's sidecar, or None if it is missing or older than `summary_file`."""
+    path = metrics_path(out_prefix)
+    if not os.path.isfile(path):
+        return None
+    if summary_file and os.path.isfile(summary_file) and os.path.getmtime(path) < os.path.getmtime(summary_file):
+        return None
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
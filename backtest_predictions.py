@@ -7,21 +7,32 @@ Calculates:
   - Overshoot analysis
 Produces CSV reports and per-source summaries.
 """
+import argparse
+import importlib
 import os
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import numpy as np
 import json
 
+from backtest_metrics import build_metrics, detail_metrics, save_metrics, sums_metrics
+from instruments import PERIODS, merged_name, select, symbol_prefix
+from merged_table import compact_merged, expand_dates, load_merged
+from result_cache import cache_key, get, link, linked_key, put
+from rolling_metrics import parse_windows, rolling_metrics
+from source_matrix import source_matrix, to_frame
+
 WORKDIR = os.path.dirname(__file__)
+# code the cached results depend on: this script and the local modules it loads and
+# scores the merged file with (directly or through merged_table); editing any of it
+# invalidates the result cache
+BACKTEST_MODULES = ['merged_table', 'csv_cache', 'ohlc_store', 'schema_registry', 'range_parsing',
+                    'rolling_metrics', 'source_matrix']
+BACKTEST_CODE = [os.path.abspath(__file__)] + [os.path.abspath(importlib.import_module(m).__file__)
+                                               for m in BACKTEST_MODULES]
 
-def run_backtest(merged_file, out_prefix):
-    print(f"\n{'='*70}")
-    print(f"Running backtest on {os.path.basename(merged_file)}")
-    print(f"{'='*70}")
-    
-    df = pd.read_csv(merged_file, parse_dates=['Date'])
-    df = df.sort_values('Date')
-    
+def score_predictions(df):
+    """Add the range-coverage and error columns to merged prediction rows."""
     # Drop rows missing market data
     df = df.dropna(subset=['Market_High', 'Market_Low'])
     
@@ -54,83 +65,186 @@ def run_backtest(merged_file, out_prefix):
     df['Total_Error'] = df['Abs_High_Error'] + df['Abs_Low_Error']
     
     # Overshoot (only positive errors, i.e., when predictions were wrong)
-    df['High_Overshoot'] = df['High_Error'].apply(lambda x: max(0, x))
-    df['Low_Overshoot'] = df['Low_Error'].apply(lambda x: max(0, x))
-    
-    # === STEP 3: PER-SOURCE SUMMARY ===
-    sources = df['Source'].unique()
-    summary_rows = []
+    df['High_Overshoot'] = df['High_Error'].clip(lower=0)
+    df['Low_Overshoot'] = df['Low_Error'].clip(lower=0)
+    return df
+
+
+# Per-source sums behind the summary table (accumulated across chunks when streaming)
+SUM_COLUMNS = ['Full_Hit', 'High_Miss', 'Low_Miss', 'High_Error', 'Low_Error',
+               'Abs_High_Error', 'Abs_Low_Error', 'Total_Error', 'High_Overshoot', 'Low_Overshoot']
+
+
+def source_sums(df):
+    """Per-source sums and counts of scored rows in one groupby; chunks combine with `add`."""
+    df = df.assign(High_Overshoot_N=df['High_Overshoot'] > 0, Low_Overshoot_N=df['Low_Overshoot'] > 0)
+    columns = SUM_COLUMNS + ['High_Overshoot_N', 'Low_Overshoot_N']
+    sums = df.groupby('Source', observed=True).agg(
+        **{c: (c, 'sum') for c in columns}, N_Days=('Full_Hit', 'size')).sort_index()
+    sums[columns] = sums[columns].astype(float)
+    return sums
+
+
+def masked_mean(total, count):
+    # 0 (not NaN) for sources that never overshot, as in the per-source loop
+    return [round(s / c, 2) if c > 0 else 0 for s, c in zip(total, count)]
+
+
+def summary_from_sums(sums):
+    """Build the per-source summary table from accumulated sums."""
+    import pandas as pd
+    n = sums['N_Days']
+    high_error = sums['High_Error'] / n
+    low_error = sums['Low_Error'] / n
+    summary_df = pd.DataFrame({
+        'Source': sums.index,
+        'N_Days': n.astype(int).values,
+        'Hit_Count': sums['Full_Hit'].astype(int).values,
+        'Hit_Rate_%': (sums['Full_Hit'] / n * 100).round(2).values,
+        'High_Miss_%': (sums['High_Miss'] / n * 100).round(2).values,
+        'Low_Miss_%': (sums['Low_Miss'] / n * 100).round(2).values,
+        'Avg_High_Error_pts': high_error.round(2).values,
+        'Avg_Low_Error_pts': low_error.round(2).values,
+        'Avg_Abs_High_Error_pts': (sums['Abs_High_Error'] / n).round(2).values,
+        'Avg_Abs_Low_Error_pts': (sums['Abs_Low_Error'] / n).round(2).values,
+        'Avg_Total_Error_pts': (sums['Total_Error'] / n).round(2).values,
+        # overshoot averages only count the days the prediction was wrong
+        'Avg_High_Overshoot_pts': masked_mean(sums['High_Overshoot'], sums['High_Overshoot_N']),
+        'Avg_Low_Overshoot_pts': masked_mean(sums['Low_Overshoot'], sums['Low_Overshoot_N']),
+        'Directional_Bias': (high_error - low_error).round(2).values,
+    })
+    return summary_df.sort_values('Hit_Rate_%', ascending=False)
+
+
+def run_backtest(merged_file, out_prefix, chunksize=None, windows=None, use_cache=True):
+    """Backtest one merged predictions file and write its detail and summary CSVs.
+
+    With `chunksize`, the file is streamed in chunks of that many rows and only
+    per-source sums are kept in memory; the returned detail frame is then None.
+    With `windows` (trading-day counts), trailing per-source metrics for every
+    date are written to `<prefix>_backtest_rolling.csv` as well.
+    The detail and summary frames come from the result cache when the merged
+    file and the backtest code are unchanged; `use_cache=False` recomputes and
+    refreshes the cached entry. The entry also holds the date x source matrix
+    (source_matrix.py) the dashboards are drawn from.
+    """
+    print(f"\n{'='*70}")
+    print(f"Running backtest on {os.path.basename(merged_file)}")
+    print(f"{'='*70}")
+    if chunksize:
+        return run_backtest_chunked(merged_file, out_prefix, chunksize)
     
-    for src in sorted(sources):
-        src_df = df[df['Source'] == src]
-        n_days = len(src_df)
-        
-        # Coverage
-        hit_count = src_df['Full_Hit'].sum()
-        hit_pct = (hit_count / n_days * 100) if n_days > 0 else 0
-        high_miss_pct = (src_df['High_Miss'].sum() / n_days * 100) if n_days > 0 else 0
-        low_miss_pct = (src_df['Low_Miss'].sum() / n_days * 100) if n_days > 0 else 0
-        
-        # Errors
-        avg_high_error = src_df['High_Error'].mean()
-        avg_low_error = src_df['Low_Error'].mean()
-        avg_abs_high_error = src_df['Abs_High_Error'].mean()
-        avg_abs_low_error = src_df['Abs_Low_Error'].mean()
-        avg_total_error = src_df['Total_Error'].mean()
-        
-        # Overshoot (only when wrong)
-        high_overshoots = src_df[src_df['High_Overshoot'] > 0]['High_Overshoot']
-        low_overshoots = src_df[src_df['Low_Overshoot'] > 0]['Low_Overshoot']
-        avg_high_overshoot = high_overshoots.mean() if len(high_overshoots) > 0 else 0
-        avg_low_overshoot = low_overshoots.mean() if len(low_overshoots) > 0 else 0
-        
-        # Directional Bias
-        # Positive avg_high_error = channel underestimates the high (biased low)
-        # Positive avg_low_error = channel overestimates the low (biased high)
-        bias = avg_high_error - avg_low_error  # positive = biased low overall
+    detail_file = os.path.join(WORKDIR, f'{out_prefix}_backtest_detail.csv')
+    summary_file = os.path.join(WORKDIR, f'{out_prefix}_backtest_summary.csv')
+    inputs = [merged_file] + BACKTEST_CODE
+    key = cache_key(inputs)
+    cached = get(key) if use_cache else None
+    if cached is not None:
+        print(f'⚡ Result cache hit ({key[:12]})')
+        df, summary_df = cached['detail'], cached['summary']
+        # the CSVs only need rewriting if they were last written from other inputs
+        stale = linked_key(out_prefix) != key or not (os.path.isfile(detail_file) and os.path.isfile(summary_file))
+    else:
+        df = load_merged(merged_file)
+        df['Date'] = expand_dates(df['Date'])
+        df = df.sort_values('Date')
+        df = score_predictions(df)
         
-        summary_rows.append({
-            'Source': src,
-            'N_Days': n_days,
-            'Hit_Count': int(hit_count),
-            'Hit_Rate_%': round(hit_pct, 2),
-            'High_Miss_%': round(high_miss_pct, 2),
-            'Low_Miss_%': round(low_miss_pct, 2),
-            'Avg_High_Error_pts': round(avg_high_error, 2),
-            'Avg_Low_Error_pts': round(avg_low_error, 2),
-            'Avg_Abs_High_Error_pts': round(avg_abs_high_error, 2),
-            'Avg_Abs_Low_Error_pts': round(avg_abs_low_error, 2),
-            'Avg_Total_Error_pts': round(avg_total_error, 2),
-            'Avg_High_Overshoot_pts': round(avg_high_overshoot, 2),
-            'Avg_Low_Overshoot_pts': round(avg_low_overshoot, 2),
-            'Directional_Bias': round(bias, 2)
-        })
-    
-    summary_df = pd.DataFrame(summary_rows)
-    summary_df = summary_df.sort_values('Hit_Rate_%', ascending=False)
+        # === STEP 3: PER-SOURCE SUMMARY ===
+        summary_df = summary_from_sums(source_sums(df))
+        # the date x source matrix is cached with them for the dashboards to slice
+        frames = {'detail': df, 'summary': summary_df, 'matrix': to_frame(source_matrix(df))}
+        if key and not put(key, frames, inputs):
+            key = None
+        stale = True
     
     # Save detailed backtest results and summary
+    if stale:
+        df.to_csv(detail_file, index=False)
+        summary_df.to_csv(summary_file, index=False)
+    # without a cache entry, a previous link would point at results these CSVs no longer hold
+    link(out_prefix, key)
+    metrics_file = save_metrics(out_prefix, build_metrics(summary_df, detail_metrics(df)))
+    
+    print(f'\n✅ Saved detailed backtest: {os.path.basename(detail_file)}')
+    print(f'✅ Saved summary: {os.path.basename(summary_file)}')
+    print(f'✅ Saved metrics: {os.path.basename(metrics_file)}')
+    
+    if windows:
+        rolling_file = os.path.join(WORKDIR, f'{out_prefix}_backtest_rolling.csv')
+        rolling_metrics(df, windows).to_csv(rolling_file, index=False)
+        print(f'✅ Saved rolling metrics: {os.path.basename(rolling_file)}')
+    
+    overall = {
+        'n_rows': len(df),
+        'hit_rate': df['Full_Hit'].mean(),
+        'high_miss_rate': df['High_Miss'].mean(),
+        'low_miss_rate': df['Low_Miss'].mean(),
+        'abs_high_error': df['Abs_High_Error'].mean(),
+        'abs_low_error': df['Abs_Low_Error'].mean(),
+    }
+    print_backtest(summary_df, overall, out_prefix)
+    
+    return df, summary_df
+
+
+def run_backtest_chunked(merged_file, out_prefix, chunksize):
+    import pandas as pd
     detail_file = os.path.join(WORKDIR, f'{out_prefix}_backtest_detail.csv')
     summary_file = os.path.join(WORKDIR, f'{out_prefix}_backtest_summary.csv')
     
-    df.to_csv(detail_file, index=False)
+    sums = None
+    first = True
+    hit_dates = set()
+    for chunk in pd.read_csv(merged_file, chunksize=chunksize):
+        chunk = score_predictions(compact_merged(chunk))
+        chunk['Date'] = expand_dates(chunk['Date'])
+        # detail rows are streamed out in file order (prepare_dataset writes them date-sorted)
+        chunk.to_csv(detail_file, mode='w' if first else 'a', header=first, index=False)
+        first = False
+        hit_dates.update(chunk.loc[chunk['Full_Hit'], 'Date'])
+        part = source_sums(chunk)
+        sums = part if sums is None else sums.add(part, fill_value=0)
+    if first:
+        raise ValueError(f'No rows in {merged_file}')
+    # streamed results are not cached; drop the prefix's link to older cached ones
+    link(out_prefix, None)
+    
+    summary_df = summary_from_sums(sums.sort_index())
     summary_df.to_csv(summary_file, index=False)
+    metrics_file = save_metrics(out_prefix, build_metrics(summary_df, sums_metrics(sums, len(hit_dates))))
     
     print(f'\n✅ Saved detailed backtest: {os.path.basename(detail_file)}')
     print(f'✅ Saved summary: {os.path.basename(summary_file)}')
+    print(f'✅ Saved metrics: {os.path.basename(metrics_file)}')
+    
+    n_rows = sums['N_Days'].sum()
+    overall = {
+        'n_rows': int(n_rows),
+        'hit_rate': sums['Full_Hit'].sum() / n_rows,
+        'high_miss_rate': sums['High_Miss'].sum() / n_rows,
+        'low_miss_rate': sums['Low_Miss'].sum() / n_rows,
+        'abs_high_error': sums['Abs_High_Error'].sum() / n_rows,
+        'abs_low_error': sums['Abs_Low_Error'].sum() / n_rows,
+    }
+    print_backtest(summary_df, overall, out_prefix)
     
+    return None, summary_df
+
+
+def print_backtest(summary_df, overall, out_prefix):
     # Print summary
     print(f'\n📊 BACKTEST SUMMARY ({out_prefix}):')
     print(summary_df.to_string(index=False))
     
     # Overall statistics
     print(f'\n📈 OVERALL STATISTICS:')
-    print(f"  Total days tested: {len(df)}")
-    print(f"  Average Hit Rate across all sources: {df['Full_Hit'].mean() * 100:.2f}%")
-    print(f"  Average High Miss Rate: {df['High_Miss'].mean() * 100:.2f}%")
-    print(f"  Average Low Miss Rate: {df['Low_Miss'].mean() * 100:.2f}%")
-    print(f"  Avg Abs High Error: {df['Abs_High_Error'].mean():.2f} pts")
-    print(f"  Avg Abs Low Error: {df['Abs_Low_Error'].mean():.2f} pts")
+    print(f"  Total days tested: {overall['n_rows']}")
+    print(f"  Average Hit Rate across all sources: {overall['hit_rate'] * 100:.2f}%")
+    print(f"  Average High Miss Rate: {overall['high_miss_rate'] * 100:.2f}%")
+    print(f"  Average Low Miss Rate: {overall['low_miss_rate'] * 100:.2f}%")
+    print(f"  Avg Abs High Error: {overall['abs_high_error']:.2f} pts")
+    print(f"  Avg Abs Low Error: {overall['abs_low_error']:.2f} pts")
     
     # Top and Bottom performers
     print(f'\n🏆 TOP 3 SOURCES (by Hit Rate):')
@@ -140,21 +254,59 @@ def run_backtest(merged_file, out_prefix):
     print(f'\n⚠️  BOTTOM 3 SOURCES (by Hit Rate):')
     for idx, row in summary_df.tail(3).iterrows():
         print(f"  {row['Source']}: {row['Hit_Rate_%']:.2f}% hit rate, {row['Hit_Count']}/{row['N_Days']} days")
-    
-    return df, summary_df
+
+
+def partitions(symbols=None):
+    """(merged file, output prefix) of every instrument and period with a merged file."""
+    out = []
+    for symbol in select(symbols):
+        for period in PERIODS:
+            merged_file = os.path.join(WORKDIR, merged_name(symbol, period))
+            if os.path.isfile(merged_file):
+                out.append((merged_file, symbol_prefix(symbol, period)))
+    return out
+
+
+def _backtest_partition(part, chunksize, windows, use_cache):
+    # runs in a pool worker; only the summary travels back
+    merged_file, out_prefix = part
+    return run_backtest(merged_file, out_prefix, chunksize=chunksize, windows=windows, use_cache=use_cache)[1]
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Backtest merged news-source predictions')
+    p.add_argument('--chunksize', type=int, default=None,
+                   help='Stream the merged files in chunks of N rows (bounded memory)')
+    p.add_argument('--symbol', action='append', help='Instrument(s) to backtest (default: all in instruments.py)')
+    p.add_argument('--workers', type=int, default=1,
+                   help='Backtest (symbol, period) partitions in this many processes (0 = one per CPU)')
+    p.add_argument('--rolling', type=parse_windows, default=None, metavar='20,60,250',
+                   help='Also write per-source metrics over these trailing windows (trading days)')
+    p.add_argument('--no-cache', action='store_true',
+                   help='Recompute (and refresh the result cache) even if it holds this backtest')
+    args = p.parse_args()
+    if args.rolling and args.chunksize:
+        p.error('--rolling needs the full detail table; it cannot be combined with --chunksize')
+    return args
+
 
 if __name__ == '__main__':
-    # Run backtest for both 1-year and 3-year
-    df_1yr, summary_1yr = run_backtest(
-        os.path.join(WORKDIR, 'merged_predictions_1year.csv'),
-        '1year'
-    )
-    
-    df_3yr, summary_3yr = run_backtest(
-        os.path.join(WORKDIR, 'merged_predictions_3year.csv'),
-        '3year'
-    )
+    args = parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    # Run backtest for every instrument, 1-year and 3-year
+    parts = partitions(args.symbol)
+    if workers > 1 and len(parts) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(parts))) as pool:
+            # map() yields in submission order, so the partitions finish in a fixed order
+            summaries = list(pool.map(_backtest_partition, parts, repeat(args.chunksize), repeat(args.rolling),
+                                      repeat(not args.no_cache)))
+    else:
+        summaries = [_backtest_partition(part, args.chunksize, args.rolling, not args.no_cache) for part in parts]
     
     print(f"\n{'='*70}")
     print("✅ BACKTEST COMPLETE")
     print(f"{'='*70}")
+    for (_, out_prefix), summary_df in zip(parts, summaries):
+        best = summary_df.iloc[0]
+        print(f"  {out_prefix}: {len(summary_df)} sources, best {best['Source']} "
+              f"({best['Hit_Rate_%']:.2f}% hit rate, {best['Hit_Count']}/{best['N_Days']} days)")
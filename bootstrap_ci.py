@@ -0,0 +1,203 @@
+"""
+Block-bootstrap confidence intervals for the per-source backtest metrics.
+Trading days are resampled in circular blocks (keeping short-range
+autocorrelation inside each block). A resample is just a count of how often
+each day was drawn, so every metric of every source for a whole batch of
+resamples is one matrix product of those counts with the day × source sums.
+Batches run in a process pool.
+
+Besides percentile intervals, each metric gets rank-stability probabilities:
+how often a source keeps its full-sample rank and how often it ranks first.
+"""
+import argparse
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+WORKDIR = os.path.dirname(__file__)
+
+# metric -> (numerator column, denominator column or None for row count, scale, better)
+# `better` orders sources when ranking: 'high', 'low', or 'abs' (closest to zero)
+METRICS = {
+    'Hit_Rate_%': ('Full_Hit', None, 100, 'high'),
+    'High_Miss_%': ('High_Miss', None, 100, 'low'),
+    'Low_Miss_%': ('Low_Miss', None, 100, 'low'),
+    'Avg_High_Error_pts': ('High_Error', None, 1, 'abs'),
+    'Avg_Low_Error_pts': ('Low_Error', None, 1, 'abs'),
+    'Avg_Abs_High_Error_pts': ('Abs_High_Error', None, 1, 'low'),
+    'Avg_Abs_Low_Error_pts': ('Abs_Low_Error', None, 1, 'low'),
+    'Avg_Total_Error_pts': ('Total_Error', None, 1, 'low'),
+    # overshoot averages only count the days the prediction was wrong
+    'Avg_High_Overshoot_pts': ('High_Overshoot', 'High_Overshoot_N', 1, 'low'),
+    'Avg_Low_Overshoot_pts': ('Low_Overshoot', 'Low_Overshoot_N', 1, 'low'),
+    'Directional_Bias': ('Bias', None, 1, 'abs'),
+}
+BEST_METRICS = {'Best_Share_%': ('Is_Best', None, 100, 'high')}
+
+
+def day_matrices(df, metrics, date_col='Date', source_col='Source'):
+    """Per-day sums of every metric's numerator and denominator.
+
+    Returns (sources, num, den) with num/den shaped days × (sources · metrics).
+    """
+    df = df.assign(_n=1.0)
+    cols = sorted({c for num, den, _, _ in metrics.values() for c in (num, den or '_n')})
+    sums = df.groupby([date_col, source_col], observed=True)[cols].sum().astype(float)
+    sums = sums.unstack(source_col, fill_value=0.0)
+    sources = list(sums.columns.get_level_values(source_col).unique())
+    num = np.hstack([sums[m[0]][sources].to_numpy() for m in metrics.values()])
+    den = np.hstack([sums[m[1] or '_n'][sources].to_numpy() for m in metrics.values()])
+    return sources, num, den
+
+
+def ratio(num, den, scale):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(den > 0, num / np.where(den > 0, den, 1), np.nan) * scale
+
+
+def ranks(est, better, rng=None):
+    """1-based rank of each source (last axis) per row; NaN estimates rank last.
+
+    Ties keep the source order, or are broken at random with `rng` so that no
+    source is favoured by its position.
+    """
+    key = {'high': -est, 'low': est, 'abs': np.abs(est)}[better]
+    key = np.where(np.isnan(key), np.inf, key)
+    if rng is None:
+        order = np.argsort(key, axis=-1, kind='stable')
+    else:
+        order = np.lexsort((rng.random(key.shape), key), axis=-1)
+    return np.argsort(order, axis=-1, kind='stable') + 1
+
+
+def block_weights(rng, n_resamples, n_days, block):
+    """How many times each day is drawn by circular-block resampling: n_resamples × n_days."""
+    n_blocks = -(-n_days // block)
+    starts = rng.integers(0, n_days, size=(n_resamples, n_blocks))
+    idx = ((starts[:, :, None] + np.arange(block)) % n_days).reshape(n_resamples, -1)[:, :n_days]
+    flat = (np.arange(n_resamples)[:, None] * n_days + idx).ravel()
+    return np.bincount(flat, minlength=n_resamples * n_days).reshape(n_resamples, n_days).astype(float)
+
+
+# --- process-pool workers ---
+
+# day matrices of a pool worker, sent once per process
+_worker_data = None
+
+
+def _init_worker(num, den):
+    global _worker_data
+    _worker_data = (num, den)
+
+
+def _resample_batch(seed, n_resamples, block):
+    num, den = _worker_data
+    w = block_weights(np.random.default_rng(seed), n_resamples, len(num), block)
+    return w @ num, w @ den
+
+
+def bootstrap(df, metrics=METRICS, n_resamples=10_000, block=5, batch=500, workers=1, seed=0):
+    """Percentile CIs and rank stability of every (source, metric).
+
+    `df` holds per-row values with Date and Source columns (see `score_predictions`).
+    """
+    import pandas as pd
+    sources, num, den = day_matrices(df, metrics)
+    n_src, n_met = len(sources), len(metrics)
+    scales = np.repeat([m[2] for m in metrics.values()], n_src)
+    # masked means are 0 (not NaN) without any counted day, as in the backtest summary
+    masked = np.repeat([m[1] is not None for m in metrics.values()], n_src)
+
+    sizes = [min(batch, n_resamples - b) for b in range(0, n_resamples, batch)]
+    # one child per batch plus one for breaking rank ties
+    *seeds, tie_seed = np.random.SeedSequence(seed).spawn(len(sizes) + 1)
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes)),
+                                 initializer=_init_worker, initargs=(num, den)) as pool:
+            # map() yields in submission order, so results do not depend on scheduling
+            parts = list(pool.map(_resample_batch, seeds, sizes, repeat(block)))
+    else:
+        _init_worker(num, den)
+        parts = [_resample_batch(s, n, block) for s, n in zip(seeds, sizes)]
+    est = ratio(np.vstack([p[0] for p in parts]), np.vstack([p[1] for p in parts]), scales)
+    point = ratio(num.sum(axis=0), den.sum(axis=0), scales)
+    est[:, masked] = np.nan_to_num(est[:, masked])
+    point[masked] = np.nan_to_num(point[masked])
+
+    est = est.reshape(n_resamples, n_met, n_src)
+    point = point.reshape(n_met, n_src)
+    tie_rng = np.random.default_rng(tie_seed)
+    rows = []
+    for j, (name, (_, _, _, better)) in enumerate(metrics.items()):
+        point_rank = ranks(point[j], better)
+        boot_rank = ranks(est[:, j], better, tie_rng)
+        lo, hi = np.nanpercentile(est[:, j], [2.5, 97.5], axis=0)
+        rows.append(pd.DataFrame({
+            'Metric': name,
+            'Source': sources,
+            'Estimate': point[j].round(2),
+            'CI_Low': lo.round(2),
+            'CI_High': hi.round(2),
+            'Rank': point_rank,
+            'P_Same_Rank': (boot_rank == point_rank).mean(axis=0).round(4),
+            'P_Rank_1': (boot_rank == 1).mean(axis=0).round(4),
+        }))
+    return pd.concat(rows, ignore_index=True)
+
+
+def load_detail(prefix):
+    import pandas as pd
+    detail = pd.read_csv(os.path.join(WORKDIR, f'{prefix}_backtest_detail.csv'))
+    return detail.assign(High_Overshoot_N=detail['High_Overshoot'] > 0,
+                         Low_Overshoot_N=detail['Low_Overshoot'] > 0,
+                         Bias=detail['High_Error'] - detail['Low_Error'])
+
+
+def load_best(prefix):
+    """One row per (day, source) with Is_Best, from <prefix>_best_source_per_day.csv; None if absent."""
+    import pandas as pd
+    path = os.path.join(WORKDIR, f'{prefix}_best_source_per_day.csv')
+    if not os.path.isfile(path):
+        return None
+    best = pd.read_csv(path).dropna(subset=['Best_Source'])
+    sources = sorted(best['Best_Source'].unique())
+    grid = pd.MultiIndex.from_product([best['Date'].unique(), sources], names=['Date', 'Source']).to_frame(index=False)
+    chosen = pd.MultiIndex.from_arrays([best['Date'], best['Best_Source']])
+    grid['Is_Best'] = pd.MultiIndex.from_frame(grid).isin(chosen)
+    return grid
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Block-bootstrap confidence intervals for per-source metrics')
+    p.add_argument('--prefix', default='3year', help='Reads <prefix>_backtest_detail.csv')
+    p.add_argument('--resamples', type=int, default=10_000)
+    p.add_argument('--block', type=int, default=5, help='Block length in trading days')
+    p.add_argument('--batch', type=int, default=500, help='Resamples per worker task')
+    p.add_argument('--workers', type=int, default=1,
+                   help='Number of worker processes (0 = one per CPU)')
+    p.add_argument('--seed', type=int, default=0)
+    return p.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    import pandas as pd
+    workers = args.workers or os.cpu_count() or 1
+    opts = dict(n_resamples=args.resamples, block=args.block, batch=args.batch, workers=workers, seed=args.seed)
+    t0 = time.perf_counter()
+    results = [bootstrap(load_detail(args.prefix), METRICS, **opts)]
+    best = load_best(args.prefix)
+    if best is not None:
+        results.append(bootstrap(best, BEST_METRICS, **opts))
+    out = pd.concat(results, ignore_index=True)
+    elapsed = time.perf_counter() - t0
+
+    out_file = os.path.join(WORKDIR, f'{args.prefix}_bootstrap_ci.csv')
+    out.to_csv(out_file, index=False)
+    print(f'{args.resamples} resamples (block {args.block}) with {workers} worker(s) in {elapsed:.2f}s')
+    print(f'✅ Saved confidence intervals: {os.path.basename(out_file)}')
+    print('\n📊 HIT RATE 95% CI:')
+    hit = out[out['Metric'] == 'Hit_Rate_%'].sort_values('Rank')
+    print(hit.drop(columns='Metric').to_string(index=False))
@@ -0,0 +1,290 @@
+"""
+Headless, parallel chart rendering for the backtest dashboards.
+Charts are described by small picklable specs — a renderer name, the
+pre-aggregated data it draws and the output path without extension — built in
+the parent process from the summary/metrics files and by slicing the date x
+source matrix of the detail rows (source_matrix.py). `render_all` draws the
+specs in a process pool on the Agg backend and writes every requested format
+(PNG, SVG, ...), so rendering all period × chart combinations and the
+per-source drilldowns scales with cores.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from source_matrix import row_mean, source_frame
+
+WORKDIR = os.path.dirname(__file__)
+DRILLDOWN_DIR = os.path.join(WORKDIR, 'drilldown')
+DEFAULT_FORMATS = ('png',)
+
+
+def short_name(source, out_prefix=''):
+    name = source.replace('_nifty50_', '_').replace('.csv', '')
+    return name.replace(f'_{out_prefix}', '') if out_prefix else name
+
+
+def chart_spec(kind, out, data, **opts):
+    """A chart to render: `out` is the output path without extension."""
+    return {'kind': kind, 'out': out, 'data': data, 'opts': opts}
+
+
+def backtest_specs(summary_df, matrix, out_prefix, drilldown=False):
+    """Dashboard and cumulative-analysis specs of one backtest (plus per-source drilldowns).
+
+    `matrix` is the date x source matrix of the detail rows (source_matrix.py).
+    """
+    summary_df = summary_df.sort_values('Hit_Rate_%', ascending=False).assign(
+        Source=lambda d: d['Source'].astype(str))
+    top = summary_df.head(3)['Source'].tolist()
+    best = summary_df.iloc[0]['Source']
+    specs = [
+        chart_spec('dashboard', os.path.join(WORKDIR, f'{out_prefix}_backtest_dashboard'),
+                   summary_df[['Source', 'Hit_Rate_%', 'Avg_Abs_High_Error_pts', 'Avg_Abs_Low_Error_pts',
+                               'Directional_Bias', 'High_Miss_%', 'Low_Miss_%']].reset_index(drop=True),
+                   prefix=out_prefix),
+        chart_spec('cumulative', os.path.join(WORKDIR, f'{out_prefix}_cumulative_analysis'),
+                   {'top': [(src, published(matrix, 'Cumulative_Hits', src)) for src in top],
+                    'best': (best, published(matrix, 'Total_Error', best))},
+                   prefix=out_prefix),
+    ]
+    if drilldown:
+        for src in matrix.columns.unique('Source'):
+            specs.append(chart_spec('drilldown', os.path.join(DRILLDOWN_DIR, f'{out_prefix}_{short_name(src, out_prefix)}'),
+                                    source_frame(matrix, src).reset_index(), prefix=out_prefix, source=src))
+    return specs
+
+
+def published(matrix, metric, source):
+    """Date/`metric`/Rows frame of one source on the days it published."""
+    return source_frame(matrix, source)[[metric, 'Rows']].reset_index()
+
+
+def best_count_spec(summary_df, out, title, kind='best_counts'):
+    """Times-selected-as-best bars with the within-range % line, from a best_source_summary table.
+
+    `kind` is 'best_counts' (the per-period layout) or 'best_counts_simple'.
+    """
+    df = summary_df.sort_values('Count', ascending=False).reset_index(drop=True)
+    return chart_spec(kind, out, df[['Best_Source', 'Count', 'WithinPct']], title=title)
+
+
+# --- renderers (run in the pool workers) ---
+
+def _pyplot():
+    # matplotlib is only loaded where charts are drawn, and always headless
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _render_dashboard(df, opts):
+    plt = _pyplot()
+    import seaborn as sns
+    out_prefix = opts['prefix']
+    with sns.axes_style('whitegrid'):
+        fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+        fig.suptitle(f'Nifty 50 Prediction Backtest Results ({out_prefix.upper()})', fontsize=16, fontweight='bold')
+        sources_short = [short_name(s, out_prefix) for s in df['Source']]
+
+        # Plot 1: Hit Rate Comparison (Top Left)
+        ax = axes[0, 0]
+        colors = ['green' if h > 4 else 'orange' if h > 3 else 'red' for h in df['Hit_Rate_%']]
+        ax.barh(sources_short, df['Hit_Rate_%'], color=colors, alpha=0.7)
+        ax.set_xlabel('Hit Rate (%)', fontsize=11, fontweight='bold')
+        ax.set_title('Hit Rate by Source', fontsize=12, fontweight='bold')
+        ax.axvline(x=df['Hit_Rate_%'].mean(), color='blue', linestyle='--', linewidth=2, label='Average')
+        ax.legend()
+        ax.grid(axis='x', alpha=0.3)
+
+        # Plot 2: Error Magnitudes (Top Right)
+        ax = axes[0, 1]
+        x_pos = np.arange(len(df))
+        width = 0.35
+        ax.bar(x_pos - width/2, df['Avg_Abs_High_Error_pts'], width, label='Avg Abs High Error', alpha=0.8)
+        ax.bar(x_pos + width/2, df['Avg_Abs_Low_Error_pts'], width, label='Avg Abs Low Error', alpha=0.8)
+        ax.set_ylabel('Error (pts)', fontsize=11, fontweight='bold')
+        ax.set_title('Average Absolute Errors by Source', fontsize=12, fontweight='bold')
+        ax.set_xticks(x_pos)
+        ax.set_xticklabels(sources_short, rotation=45, ha='right', fontsize=9)
+        ax.legend()
+        ax.grid(axis='y', alpha=0.3)
+
+        # Plot 3: Directional Bias (Bottom Left)
+        ax = axes[1, 0]
+        bias_colors = ['red' if b < 0 else 'blue' for b in df['Directional_Bias']]
+        ax.barh(sources_short, df['Directional_Bias'], color=bias_colors, alpha=0.7)
+        ax.set_xlabel('Bias (pts)', fontsize=11, fontweight='bold')
+        ax.set_title('Directional Bias (Negative = Underestimates High)', fontsize=12, fontweight='bold')
+        ax.axvline(x=0, color='black', linestyle='-', linewidth=1)
+        ax.grid(axis='x', alpha=0.3)
+
+        # Plot 4: Miss Rate Breakdown (Bottom Right)
+        ax = axes[1, 1]
+        miss_data = df[['High_Miss_%', 'Low_Miss_%']].head(10)  # top 10
+        x_pos = np.arange(len(miss_data))
+        ax.bar(x_pos - width/2, miss_data['High_Miss_%'], width, label='High Miss %', alpha=0.8, color='coral')
+        ax.bar(x_pos + width/2, miss_data['Low_Miss_%'], width, label='Low Miss %', alpha=0.8, color='skyblue')
+        ax.set_ylabel('Miss Rate (%)', fontsize=11, fontweight='bold')
+        ax.set_title('Miss Rate Breakdown (Top 10 Sources)', fontsize=12, fontweight='bold')
+        ax.set_xticks(x_pos)
+        ax.set_xticklabels(sources_short[:10], rotation=45, ha='right', fontsize=9)
+        ax.legend()
+        ax.grid(axis='y', alpha=0.3)
+        plt.tight_layout()
+    return fig, {'bbox_inches': 'tight'}
+
+
+def _render_cumulative(data, opts):
+    plt = _pyplot()
+    import seaborn as sns
+    out_prefix = opts['prefix']
+    with sns.axes_style('whitegrid'):
+        fig, axes = plt.subplots(2, 1, figsize=(16, 10))
+        fig.suptitle(f'Cumulative Hit Analysis ({out_prefix.upper()})', fontsize=16, fontweight='bold')
+
+        # Plot 1: Cumulative hits over time (Top)
+        ax = axes[0]
+        for src, s in data['top']:
+            ax.plot(s['Date'], s['Cumulative_Hits'], marker='o', markersize=2, label=short_name(src, out_prefix), linewidth=2)
+        ax.set_ylabel('Cumulative Hit Count', fontsize=11, fontweight='bold')
+        ax.set_title('Cumulative Hits Over Time (Top 3 Sources)', fontsize=12, fontweight='bold')
+        ax.legend(loc='upper left')
+        ax.grid(alpha=0.3)
+
+        # Plot 2: Daily errors over time (Bottom) - for best source
+        ax = axes[1]
+        best_source, best = data['best']
+        mean_error = row_mean(best, 'Total_Error')
+        ax.plot(best['Date'], best['Total_Error'], marker='.', markersize=3, label='Total Error', linewidth=1.5, color='red', alpha=0.7)
+        ax.axhline(y=mean_error, color='red', linestyle='--', linewidth=2, label=f'Average Error ({mean_error:.0f} pts)')
+        ax.fill_between(best['Date'], best['Total_Error'], alpha=0.3, color='red')
+        ax.set_ylabel('Daily Error (pts)', fontsize=11, fontweight='bold')
+        ax.set_xlabel('Date', fontsize=11, fontweight='bold')
+        ax.set_title(f'Daily Total Error Over Time - {short_name(best_source, out_prefix)} (Best Source)', fontsize=12, fontweight='bold')
+        ax.legend(loc='upper left')
+        ax.grid(alpha=0.3)
+        plt.tight_layout()
+    return fig, {'bbox_inches': 'tight'}
+
+
+def _render_drilldown(df, opts):
+    plt = _pyplot()
+    import seaborn as sns
+    name = short_name(opts['source'], opts['prefix'])
+    with sns.axes_style('whitegrid'):
+        fig, axes = plt.subplots(2, 1, figsize=(14, 9), sharex=True)
+        fig.suptitle(f'{name} ({opts["prefix"].upper()})', fontsize=15, fontweight='bold')
+
+        ax = axes[0]
+        ax.plot(df['Date'], df['Cumulative_Hits'], color='green', linewidth=2)
+        ax.set_ylabel('Cumulative Hit Count', fontsize=11, fontweight='bold')
+        ax.set_title(f'Cumulative Hits ({int(df["Full_Hit"].sum())}/{int(df["Rows"].sum())} days)', fontsize=12, fontweight='bold')
+        ax.grid(alpha=0.3)
+
+        ax = axes[1]
+        ax.plot(df['Date'], df['High_Error'], linewidth=1, color='coral', label='High Error')
+        ax.plot(df['Date'], df['Low_Error'], linewidth=1, color='skyblue', label='Low Error')
+        ax.plot(df['Date'], df['Total_Error'], linewidth=1.5, color='red', alpha=0.7, label='Total Error')
+        ax.axhline(y=0, color='black', linewidth=1)
+        ax.set_ylabel('Error (pts)', fontsize=11, fontweight='bold')
+        ax.set_xlabel('Date', fontsize=11, fontweight='bold')
+        ax.set_title('Daily Errors', fontsize=12, fontweight='bold')
+        ax.legend(loc='upper left')
+        ax.grid(alpha=0.3)
+        plt.tight_layout()
+    return fig, {'bbox_inches': 'tight'}
+
+
+def _render_best_counts(df, opts):
+    plt = _pyplot()
+    # the plot_both_periods.py layout
+    fig, ax1 = plt.subplots(figsize=(14, 6), dpi=100)
+    x = range(len(df))
+    color1 = '#1f77b4'
+    ax1.bar(x, df['Count'].values, color=color1, alpha=0.7, label='Times Selected as Best')
+    ax1.set_xlabel('Source', fontsize=11, fontweight='bold')
+    ax1.set_ylabel('Count', fontsize=11, fontweight='bold', color=color1)
+    ax1.tick_params(axis='y', labelcolor=color1)
+    ax1.set_xticks(x)
+    ax1.set_xticklabels([short_name(s) for s in df['Best_Source'].values], rotation=45, ha='right', fontsize=9)
+
+    ax2 = ax1.twinx()
+    color2 = '#ff7f0e'
+    ax2.plot(x, df['WithinPct'].values, marker='o', color=color2, linewidth=2, markersize=6, label='Within Range %')
+    ax2.set_ylabel('Within Range %', fontsize=11, fontweight='bold', color=color2)
+    ax2.tick_params(axis='y', labelcolor=color2)
+
+    ax1.set_title(f"{opts['title']}\n(Count of times each source was closest to actual High/Low)",
+                  fontsize=12, fontweight='bold', pad=15)
+    lines1, labels1 = ax1.get_legend_handles_labels()
+    lines2, labels2 = ax2.get_legend_handles_labels()
+    ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper right', fontsize=9)
+    plt.tight_layout()
+    return fig, {'bbox_inches': 'tight'}
+
+
+def _render_best_counts_simple(df, opts):
+    plt = _pyplot()
+    # the plot_best_source_counts.py layout
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.bar(df['Best_Source'], df['Count'], color='tab:blue')
+    ax.set_xlabel('News Source')
+    ax.set_ylabel('Best Count (number of days chosen as best)', color='tab:blue')
+    ax.tick_params(axis='y', labelcolor='tab:blue')
+    ax.set_xticks(range(len(df)))
+    ax.set_xticklabels(df['Best_Source'], rotation=45, ha='right')
+
+    ax2 = ax.twinx()
+    ax2.plot(df['Best_Source'], df['WithinPct'], color='tab:orange', marker='o')
+    ax2.set_ylabel('WithinRange % (of days chosen)', color='tab:orange')
+    ax2.tick_params(axis='y', labelcolor='tab:orange')
+    plt.title(opts['title'])
+    plt.tight_layout()
+    return fig, {}
+
+
+RENDERERS = {
+    'dashboard': _render_dashboard,
+    'cumulative': _render_cumulative,
+    'drilldown': _render_drilldown,
+    'best_counts': _render_best_counts,
+    'best_counts_simple': _render_best_counts_simple,
+}
+
+
+def render(spec, formats=DEFAULT_FORMATS, dpi=150):
+    """Draw one spec and save it in every format; returns the written paths."""
+    plt = _pyplot()
+    fig, save_opts = RENDERERS[spec['kind']](spec['data'], spec['opts'])
+    os.makedirs(os.path.dirname(spec['out']) or '.', exist_ok=True)
+    paths = []
+    for fmt in formats:
+        path = f"{spec['out']}.{fmt}"
+        fig.savefig(path, dpi=dpi, format=fmt, **save_opts)
+        paths.append(path)
+    plt.close(fig)
+    return paths
+
+
+def _render_in_worker(spec, formats, dpi):
+    return render(spec, formats, dpi)
+
+
+def render_all(specs, workers=1, formats=DEFAULT_FORMATS, dpi=150):
+    """Render `specs` (in a process pool when workers > 1); returns the written paths per spec."""
+    specs = list(specs)
+    if workers > 1 and len(specs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(specs))) as pool:
+            # map() yields in submission order
+            n = len(specs)
+            return list(pool.map(_render_in_worker, specs, [formats] * n, [dpi] * n))
+    return [render(spec, formats, dpi) for spec in specs]
+
+
+def parse_formats(text):
+    formats = tuple(f.strip().lower().lstrip('.') for f in text.split(',') if f.strip())
+    if not formats:
+        raise ValueError('No output format given')
+    return formats
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the pipeline stages:
+
+    python cli.py <stage> [variant] [options of that script]
+
+Each (stage, variant) runs one of the existing scripts with the remaining
+arguments, exactly as if it had been started directly. Nothing heavy is
+imported here: pandas, matplotlib/seaborn, lightgbm/sklearn or requests are
+loaded by the stage that runs. The stage scripts (and the modules they share)
+import pandas inside the functions that use it, so `--help` and argument
+errors of every stage, `python cli.py --help` and the report step (which
+renders from the metrics sidecar) start quickly.
+
+`python cli.py bench-startup [--runs N]` times how long every stage takes to start.
+"""
+import argparse
+import os
+import runpy
+import statistics
+import subprocess
+import sys
+import time
+
+WORKDIR = os.path.dirname(os.path.abspath(__file__))
+STARTUP_BUDGET_MS = 200
+
+# stage -> {variant: (script, description)}; the first variant is the default
+STAGES = {
+    'prepare': {
+        'merged': ('prepare_dataset.py', 'Merge the source files into merged_predictions_*.csv'),
+    },
+    'compare': {
+        'periods': ('compare_both_periods.py', 'Best source per day for each period'),
+        'best': ('merge_and_select_best.py', 'Best source per day across all periods'),
+        'ranges': ('compare_nifty_ranges.py', 'Per-article range comparison reports'),
+    },
+    'backtest': {
+        'ranges': ('backtest_predictions.py', 'Range backtest per source: detail, summary and metrics'),
+        'walk-forward': ('walk_forward.py', 'Walk-forward (no hindsight) source selection'),
+        'sweep': ('range_sweep.py', 'Parameter sweep over range adjustments'),
+        'bootstrap': ('bootstrap_ci.py', 'Block-bootstrap confidence intervals'),
+        'intraday': ('intraday_touch.py', 'First-touch backtest on minute bars'),
+        'trades': ('trade_simulator.py', 'Vectorized Entry/Target/Stop P&L'),
+        'events': ('event_backtest.py', 'Event-driven strategy backtest'),
+    },
+    'report': {
+        'text': ('generate_backtest_report.py', 'Text report per backtested partition'),
+        'html': ('html_dashboard.py', 'Interactive HTML dashboard'),
+    },
+    'plot': {
+        'dashboards': ('visualize_backtest.py', 'Backtest dashboards (PNG/SVG)'),
+        'periods': ('plot_both_periods.py', 'Best-source counts per period'),
+        'counts': ('plot_best_source_counts.py', 'Best-source counts across periods'),
+    },
+    'train': {
+        'gbm': ('train_gbm.py', 'LightGBM range models'),
+    },
+    'scrape': {
+        'news': ('scrape_news_articles.py', 'News articles'),
+        'setups': ('scrape_mint.py', 'Daily trade setups'),
+        'premarket': ('scrape_premarket.py', 'Pre-market reports'),
+    },
+}
+
+
+def usage():
+    lines = [__doc__.strip().split('\n\n')[1].strip(), '', 'stages:']
+    for stage, variants in STAGES.items():
+        for i, (variant, (script, desc)) in enumerate(variants.items()):
+            name = f'{stage} {variant}' + (' (default)' if i == 0 and len(variants) > 1 else '')
+            lines.append(f'  {name:<32} {desc} [{script}]')
+    lines += ['', f'  {"bench-startup [--runs N]":<32} Time the startup of every stage']
+    return '\n'.join(lines)
+
+
+def resolve(argv):
+    """(script, remaining args) for `<stage> [variant] args...`."""
+    stage, rest = argv[0], list(argv[1:])
+    variants = STAGES[stage]
+    variant = rest.pop(0) if rest and rest[0] in variants else next(iter(variants))
+    return variants[variant][0], rest
+
+
+def run_script(script, args):
+    """Run `script` as `__main__` with `args`, as if started directly."""
+    sys.argv = [os.path.join(WORKDIR, script)] + args
+    if WORKDIR not in sys.path:
+        sys.path.insert(0, WORKDIR)
+    # alter_sys makes the script the real __main__, so process pools can pickle its functions
+    runpy.run_module(os.path.splitext(script)[0], run_name='__main__', alter_sys=True)
+
+
+def has_cli(script):
+    # scripts without an argument parser would run for real on --help
+    with open(os.path.join(WORKDIR, script), encoding='utf-8') as f:
+        return 'ArgumentParser' in f.read()
+
+
+def startup_ms(cmd, runs):
+    """Median wall time of `python cli.py <cmd>` over `runs` runs, in ms."""
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, os.path.abspath(__file__)] + cmd, cwd=WORKDIR,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def bench_startup(runs=5):
+    """Startup time of the CLI itself, of `--help` for every stage that has options, and of the report step."""
+    cmds = [['--help']]
+    for stage, variants in STAGES.items():
+        cmds += [[stage, variant, '--help'] for variant, (script, _) in variants.items() if has_cli(script)]
+    # the cron step that should stay quick: renders from the metrics sidecars
+    cmds.append(['report', 'text'])
+    print(f'Startup time, median of {runs} runs (budget {STARTUP_BUDGET_MS} ms for quick commands):')
+    for cmd in cmds:
+        ms = startup_ms(cmd, runs)
+        mark = '✅' if ms <= STARTUP_BUDGET_MS else '  '
+        print(f"  {mark} {' '.join(cmd):<36} {ms:8.1f} ms")
+
+
+def parse_bench_args(argv):
+    p = argparse.ArgumentParser(prog='cli.py bench-startup', description='Time the startup of every stage')
+    p.add_argument('--runs', type=int, default=5, help='Runs per command; the median is reported')
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help', 'help'):
+        print(usage())
+        return
+    if argv[0] == 'bench-startup':
+        bench_startup(parse_bench_args(argv[1:]).runs)
+        return
+    if argv[0] not in STAGES:
+        print(usage())
+        raise SystemExit(f'\nUnknown stage {argv[0]!r}')
+    script, args = resolve(argv)
+    run_script(script, args)
+
+
+if __name__ == '__main__':
+    main()
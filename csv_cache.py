@@ -0,0 +1,71 @@
+"""
+Columnar cache for the CSV inputs shared by the pipeline scripts.
+`load_csv(path)` returns the same frame as `pd.read_csv(path)`, but the parsed
+result is kept as Parquet in a `.cache/` folder next to the source file.
+A cache entry is reused while the source's mtime/size match; if they changed,
+the content hash decides whether the CSV really has to be parsed again.
+"""
+import hashlib
+import json
+import os
+
+CACHE_DIR = '.cache'
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_paths(path):
+    folder = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    base = os.path.basename(path)
+    return os.path.join(folder, base + '.parquet'), os.path.join(folder, base + '.json')
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+
+def load_csv(path):
+    """Read a CSV through the Parquet cache, re-parsing only when its content changed."""
+    import pandas as pd
+    data_path, meta_path = cache_paths(path)
+    st = os.stat(path)
+    meta = _read_meta(meta_path)
+    if meta is not None and os.path.isfile(data_path):
+        fresh = meta.get('mtime_ns') == st.st_mtime_ns and meta.get('size') == st.st_size
+        if not fresh and meta.get('sha256') == file_hash(path):
+            # touched but unchanged: refresh the stamp and keep the cache
+            meta.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+            _write_meta(meta_path, meta)
+            fresh = True
+        if fresh:
+            try:
+                return pd.read_parquet(data_path)
+            except (ImportError, OSError, ValueError):
+                pass
+
+    df = pd.read_csv(path)
+    try:
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        tmp_path = data_path + '.tmp'
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, data_path)
+        _write_meta(meta_path, {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': file_hash(path)})
+    except (ImportError, OSError, TypeError, ValueError):
+        # no parquet engine or a column pyarrow can't type; serve the CSV uncached
+        pass
+    return df
@@ -0,0 +1,41 @@
+"""
+Shape-preserving downsampling of time series for charts.
+`lttb` is Largest-Triangle-Three-Buckets (Steinarsson, 2013): the first and
+last points are kept, the rest are split into equal buckets, and from each
+bucket the point forming the largest triangle with the previously kept point
+and the mean of the next bucket is kept. Peaks and troughs survive, unlike
+with striding or bucket means.
+"""
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    """Indices of the `n_out` points LTTB keeps from (x, y); every index if there are no more than that."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(x, y, n_out):
+    """(x, y) reduced to at most `n_out` points with `lttb`; NaN points are dropped first."""
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    ok = ~np.isnan(y)
+    x, y = x[ok], y[ok]
+    idx = lttb(x.astype(float), y, n_out)
+    return x[idx], y[idx]
@@ -0,0 +1,397 @@
+"""
+Event-driven backtester for strategies on the daily setups and pre-market signals.
+Three event streams are replayed in time order through one heap-based timeline:
+  - PremarketEvent: a source's pre-market sentiment (6:00-9:30 AM)
+  - SetupEvent:     a BUY/SELL Entry/Target/Stop setup (9:30 AM)
+  - BarEvent:       an instrument's daily OHLC bar (after the close)
+Within a day, pre-market updates come before setups and setups before bars.
+
+A Strategy sees the pre-market and setup events and submits orders to the
+Broker. Orders are day orders on the setup's instrument, resolved on that day's
+bar with the rules of trade_simulator.py (fill on touch, TARGET/STOP/BOTH with
+a tie rule, else exit at the close), so positions are flat after every bar.
+The broker books each round trip with its P&L and reports it back through
+`Strategy.on_fill`.
+
+Events are small `__slots__` objects and each stream is built straight from
+the loaded arrays; `--bench DAYS` replays synthetic streams of that many days
+and reports events per second.
+"""
+import argparse
+import heapq
+import math
+import os
+import time
+from itertools import count
+import numpy as np
+
+from csv_cache import load_csv
+from instruments import asset_symbols, select, source_files, symbol_prefix
+from ohlc_store import NAT_DAY, OHLCStore, from_day_numbers, to_day_numbers
+from schema_registry import find_column, source_schema
+from trade_simulator import OUTCOMES, TIE_RULES, equity_curves, load_setups, trade_summary
+
+WORKDIR = os.path.dirname(__file__)
+
+# phases within a trading day, in replay order
+PREMARKET, SETUP, BAR = 0, 1, 2
+NO_DATA, NO_FILL, TARGET, STOP, BOTH_TARGET, BOTH_STOP, CLOSE = range(len(OUTCOMES))
+
+
+class Event:
+    __slots__ = ('day',)
+    phase = None
+
+
+class PremarketEvent(Event):
+    __slots__ = ('source', 'sentiment')
+    phase = PREMARKET
+
+    def __init__(self, day, source, sentiment):
+        self.day = day
+        self.source = source
+        self.sentiment = sentiment
+
+
+class SetupEvent(Event):
+    __slots__ = ('source', 'symbol', 'side', 'entry', 'target', 'stop')
+    phase = SETUP
+
+    def __init__(self, day, source, symbol, side, entry, target, stop):
+        self.day = day
+        self.source = source
+        self.symbol = symbol
+        self.side = side  # +1 BUY, -1 SELL
+        self.entry = entry
+        self.target = target
+        self.stop = stop
+
+
+class BarEvent(Event):
+    __slots__ = ('symbol', 'open', 'high', 'low', 'close')
+    phase = BAR
+
+    def __init__(self, day, symbol, open, high, low, close):
+        self.day = day
+        self.symbol = symbol
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+
+
+class Fill:
+    """One resolved order: its setup, size, outcome code, exit price and P&L (points x qty)."""
+    __slots__ = ('setup', 'qty', 'outcome', 'exit', 'pnl')
+
+    def __init__(self, setup, qty, outcome, exit=np.nan, pnl=np.nan):
+        self.setup = setup
+        self.qty = qty
+        self.outcome = outcome
+        self.exit = exit
+        self.pnl = pnl
+
+
+class Timeline:
+    """Merges day-sorted event streams into one (day, phase) ordered replay.
+
+    The heap holds the head of every stream, so memory stays at one event per
+    stream; `push` schedules extra events (e.g. from a strategy) mid-replay.
+    Ties keep stream order.
+    """
+
+    def __init__(self, *streams):
+        self._heap = []
+        self._seq = count()
+        for stream in streams:
+            self._advance(iter(stream))
+
+    def _advance(self, it):
+        for ev in it:
+            heapq.heappush(self._heap, (ev.day, ev.phase, next(self._seq), ev, it))
+            return
+
+    def push(self, event):
+        heapq.heappush(self._heap, (event.day, event.phase, next(self._seq), event, None))
+
+    def __iter__(self):
+        heap = self._heap
+        while heap:
+            _, _, _, ev, it = heapq.heappop(heap)
+            if it is not None:
+                self._advance(it)
+            yield ev
+
+
+class Broker:
+    """Holds the day orders per instrument and books them against that instrument's bars."""
+
+    def __init__(self, tie='stop', fill='touch'):
+        if tie not in TIE_RULES:
+            raise ValueError(f'Unknown tie rule {tie!r}')
+        self.tie = tie
+        self.fill = fill
+        self.pending = {}
+        self.fills = []
+        self.realized = 0.0
+
+    def submit(self, setup, qty=1.0):
+        """Place a day order for `setup`; it is resolved on the setup day's bar."""
+        self.pending.setdefault(setup.symbol, []).append((setup, qty))
+
+    def on_bar(self, bar):
+        """Resolve the instrument's pending orders on `bar`; returns the filled ones."""
+        orders = self.pending.pop(bar.symbol, None)
+        if not orders:
+            return ()
+        filled = []
+        for setup, qty in orders:
+            if setup.day != bar.day:
+                # no bar on the setup's own day (weekend/holiday setups)
+                self.fills.append(Fill(setup, qty, NO_DATA))
+                continue
+            f = self._resolve(setup, qty, bar)
+            self.fills.append(f)
+            if f.outcome > NO_FILL:
+                self.realized += f.pnl
+                filled.append(f)
+        return filled
+
+    def _resolve(self, s, qty, bar):
+        if math.isnan(bar.high) or math.isnan(bar.low):
+            return Fill(s, qty, NO_DATA)
+        if self.fill == 'touch' and not (bar.low <= s.entry <= bar.high):
+            return Fill(s, qty, NO_FILL)
+        long = s.side > 0
+        target_hit = bar.high >= s.target if long else bar.low <= s.target
+        stop_hit = bar.low <= s.stop if long else bar.high >= s.stop
+        if target_hit and stop_hit:
+            if self.tie == 'target' or (self.tie == 'open' and abs(s.target - bar.open) < abs(s.stop - bar.open)):
+                outcome, exit_price = BOTH_TARGET, s.target
+            else:
+                outcome, exit_price = BOTH_STOP, s.stop
+        elif target_hit:
+            outcome, exit_price = TARGET, s.target
+        elif stop_hit:
+            outcome, exit_price = STOP, s.stop
+        else:
+            outcome, exit_price = CLOSE, bar.close
+        return Fill(s, qty, outcome, exit_price, (exit_price - s.entry) * s.side * qty)
+
+    def close_out(self):
+        """Orders whose instrument never printed another bar are NO_DATA."""
+        for orders in self.pending.values():
+            self.fills.extend(Fill(setup, qty, NO_DATA) for setup, qty in orders)
+        self.pending = {}
+
+    def trades(self):
+        """Every resolved order as a frame in the layout of trade_simulator's trades."""
+        import pandas as pd
+        fills = self.fills
+        setups = [f.setup for f in fills]
+        entry = np.array([s.entry for s in setups], dtype=float)
+        stop = np.array([s.stop for s in setups], dtype=float)
+        qty = np.array([f.qty for f in fills], dtype=float)
+        pnl = np.array([f.pnl for f in fills], dtype=float)
+        risk = np.abs(entry - stop) * qty
+        return pd.DataFrame({
+            'Date': from_day_numbers(np.array([s.day for s in setups], dtype=np.int64)),
+            'Source': [s.source for s in setups],
+            'Symbol': [s.symbol for s in setups],
+            'Action': np.where(np.array([s.side for s in setups]) > 0, 'BUY', 'SELL'),
+            'Entry': entry,
+            'Target': np.array([s.target for s in setups], dtype=float),
+            'Stop': stop,
+            'Qty': qty,
+            'Outcome': pd.Categorical.from_codes(np.array([f.outcome for f in fills], dtype=int),
+                                                 categories=OUTCOMES),
+            'Exit': np.array([f.exit for f in fills], dtype=float),
+            'PnL_pts': pnl,
+            'R_Multiple': np.where(risk > 0, pnl / np.where(risk > 0, risk, 1), np.nan),
+        })
+
+
+class Strategy:
+    """Base strategy: every hook is a no-op, override the ones you need."""
+
+    def on_premarket(self, event, broker):
+        pass
+
+    def on_setup(self, event, broker):
+        pass
+
+    def on_fill(self, fill, broker):
+        pass
+
+
+class TakeAll(Strategy):
+    """Trade every setup with one unit."""
+
+    def on_setup(self, event, broker):
+        broker.submit(event)
+
+
+class SentimentFilter(Strategy):
+    """Trade setups that agree with the day's pre-market sentiment (NEUTRAL or none trades both sides)."""
+
+    def __init__(self):
+        self.day = None
+        self.sentiment = None
+
+    def on_premarket(self, event, broker):
+        # the latest update of the day wins
+        self.day = event.day
+        self.sentiment = event.sentiment
+
+    def on_setup(self, event, broker):
+        sentiment = self.sentiment if self.day == event.day else None
+        if sentiment == 'BULLISH' and event.side < 0 or sentiment == 'BEARISH' and event.side > 0:
+            return
+        broker.submit(event)
+
+
+STRATEGIES = {'all': TakeAll, 'sentiment': SentimentFilter}
+
+
+def run(timeline, strategy, broker):
+    """Replay `timeline` through `strategy` and `broker`; returns the number of events."""
+    on_premarket, on_setup, on_fill = strategy.on_premarket, strategy.on_setup, strategy.on_fill
+    n = 0
+    for ev in timeline:
+        n += 1
+        phase = ev.phase
+        if phase == BAR:
+            for f in broker.on_bar(ev):
+                on_fill(f, broker)
+        elif phase == SETUP:
+            on_setup(ev, broker)
+        else:
+            on_premarket(ev, broker)
+    broker.close_out()
+    return n
+
+
+def setup_events(setups):
+    """SetupEvents of a `load_setups` frame, in date order."""
+    setups = setups.sort_values('Day', kind='stable')
+    side = np.where(setups['Action'].to_numpy() == 'BUY', 1, -1)
+    cols = [setups['Day'].tolist(), setups['Source'].tolist(), setups['Symbol'].tolist(), side.tolist(),
+            setups['Entry'].tolist(), setups['Target'].tolist(), setups['Stop'].tolist()]
+    return [SetupEvent(*row) for row in zip(*cols)]
+
+
+def premarket_events(files):
+    """PremarketEvents of pre-market report files (Date, Source and a *Sentiment column), in date order."""
+    import pandas as pd
+    frames = []
+    for f in files:
+        df = load_csv(f)
+        schema = source_schema(f, df)
+        sentiment = find_column(df.columns, 'sentiment')
+        if schema['date'] is None or sentiment is None:
+            print('Skipping', os.path.basename(f), 'no Date/Sentiment columns')
+            continue
+        source = find_column(df.columns, 'source')
+        frames.append(pd.DataFrame({
+            'Day': to_day_numbers(df[schema['date']], schema['date_format']),
+            'Source': df[source].astype(str) if source else os.path.basename(f),
+            'Sentiment': df[sentiment].astype(str).str.strip().str.upper(),
+        }))
+    if not frames:
+        return []
+    df = pd.concat(frames, ignore_index=True)
+    df = df[df['Day'] != NAT_DAY].sort_values('Day', kind='stable')
+    return [PremarketEvent(*row) for row in zip(df['Day'].tolist(), df['Source'].tolist(), df['Sentiment'].tolist())]
+
+
+def bar_events(symbol, store):
+    """BarEvents of one instrument's OHLC store (already day-sorted)."""
+    d = store.data
+    cols = [d['Day'].tolist(), [symbol] * len(d)] + [d[f].tolist() for f in ('Open', 'High', 'Low', 'Close')]
+    return [BarEvent(*row) for row in zip(*cols)]
+
+
+def synthetic_streams(days, sources, seed=0):
+    """Random pre-market, setup and bar streams over `days` trading days, for benchmarking."""
+    rng = np.random.default_rng(seed)
+    day = np.arange(days, dtype=np.int64) + 20000
+    close = 24000 + np.cumsum(rng.normal(0, 100, days))
+    high = close + rng.uniform(20, 200, days)
+    low = close - rng.uniform(20, 200, days)
+    bars = [BarEvent(*row) for row in zip(day.tolist(), ['NIFTY'] * days, close.tolist(),
+                                          high.tolist(), low.tolist(), close.tolist())]
+    moods = np.array(['BULLISH', 'BEARISH', 'NEUTRAL'])[rng.integers(0, 3, days)]
+    premarket = [PremarketEvent(d, 'Mint', m) for d, m in zip(day.tolist(), moods.tolist())]
+    n = days * sources
+    sd = np.repeat(day, sources)
+    side = np.where(rng.random(n) < 0.5, 1, -1)
+    entry = np.repeat(close, sources) + rng.normal(0, 50, n)
+    setups = [SetupEvent(*row) for row in zip(
+        sd.tolist(), [f'source{i}' for i in range(sources)] * days, ['NIFTY'] * n, side.tolist(),
+        entry.tolist(), (entry + side * 150).tolist(), (entry - side * 100).tolist())]
+    return premarket, setups, bars
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Event-driven backtest of a strategy on setups and pre-market signals')
+    p.add_argument('--prefix', default='1year', help="Period of the source files ('1year' or '3year')")
+    p.add_argument('--symbol', action='append', help='Instrument(s) to trade (default: all in instruments.py)')
+    p.add_argument('--setups', action='append', default=[],
+                   help='Extra setup files, e.g. multi-asset files with an Asset column')
+    p.add_argument('--premarket', action='append', default=[],
+                   help='Pre-market report files (e.g. from scrape_premarket.py)')
+    p.add_argument('--strategy', choices=sorted(STRATEGIES), default='all')
+    p.add_argument('--tie', choices=TIE_RULES, default='stop',
+                   help='Which level trades first when the bar reaches both')
+    p.add_argument('--fill', choices=('touch', 'assume'), default='touch',
+                   help="'touch': only trade when the bar reached Entry_Price; 'assume': always fill at entry")
+    p.add_argument('--bench', type=int, default=None, metavar='DAYS',
+                   help='Replay synthetic streams of DAYS trading days and report events/sec')
+    p.add_argument('--bench-sources', type=int, default=10, help='Setups per day in --bench mode')
+    return p.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    import pandas as pd
+    broker = Broker(tie=args.tie, fill=args.fill)
+    strategy = STRATEGIES[args.strategy]()
+
+    if args.bench:
+        streams = synthetic_streams(args.bench, args.bench_sources)
+        t0 = time.perf_counter()
+        n = run(Timeline(*streams), strategy, broker)
+        elapsed = time.perf_counter() - t0
+        print(f'Replayed {n:,} events ({args.bench} days, {len(broker.fills):,} orders) in {elapsed:.3f}s '
+              f'-> {n / elapsed:,.0f} events/sec')
+        raise SystemExit
+
+    instruments = select(args.symbol)
+    stores = {symbol: OHLCStore.open(entry['ohlc']) for symbol, entry in instruments.items()
+              if os.path.isfile(entry['ohlc'])}
+    frames = [load_setups(files, symbol) for symbol, files in
+              ((symbol, source_files(entry, args.prefix)) for symbol, entry in instruments.items()) if files]
+    if args.setups:
+        frames.append(load_setups([os.path.join(WORKDIR, f) for f in args.setups], assets=asset_symbols(instruments)))
+    if not frames:
+        raise SystemExit(f'No setup files for {", ".join(instruments)} ({args.prefix})')
+
+    streams = [premarket_events([os.path.join(WORKDIR, f) for f in args.premarket]),
+               setup_events(pd.concat(frames, ignore_index=True))]
+    streams += [bar_events(symbol, store) for symbol, store in stores.items()]
+    t0 = time.perf_counter()
+    n = run(Timeline(*streams), strategy, broker)
+    elapsed = time.perf_counter() - t0
+
+    trades = broker.trades()
+    curves = equity_curves(trades)
+    summary = trade_summary(trades, curves)
+    out_prefix = symbol_prefix(next(iter(instruments)), args.prefix) if len(instruments) == 1 and not args.setups else args.prefix
+    outputs = {'event_trades': trades, 'event_equity': curves, 'event_summary': summary}
+    for name, frame in outputs.items():
+        frame.to_csv(os.path.join(WORKDIR, f'{out_prefix}_{name}.csv'), index=False)
+    print(f'Replayed {n:,} events in {elapsed:.3f}s ({n / elapsed:,.0f} events/sec)')
+    print(f'\n💰 EVENT BACKTEST ({out_prefix}, strategy={args.strategy}, tie={args.tie}, fill={args.fill}):')
+    print(summary.to_string(index=False))
+    print(f'\n  Realized P&L: {broker.realized:.2f} pts')
+    print(f"\n✅ Saved: {', '.join(f'{out_prefix}_{name}.csv' for name in outputs)}")
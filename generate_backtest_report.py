@@ -2,18 +2,57 @@
 Generate a comprehensive backtest report summarizing all metrics, insights, and recommendations.
 """
 import os
-import pandas as pd
 import json
 from datetime import datetime
 
+from backtest_metrics import DETAIL_MEANS, build_metrics, detail_metrics, load_metrics
+from instruments import backtest_prefixes
+
 WORKDIR = os.path.dirname(__file__)
 
+# Rows per chunk when streaming the detail CSV
+DETAIL_CHUNKSIZE = 200_000
+
+
+def detail_aggregates(detail_file, chunksize=DETAIL_CHUNKSIZE):
+    """Stream the detail CSV and return the column means the report needs plus the hit-day count.
+
+    Only one chunk is held in memory at a time.
+    """
+    import pandas as pd
+    n_rows = 0
+    sums = pd.Series(0.0, index=DETAIL_MEANS)
+    hit_dates = set()
+    for chunk in pd.read_csv(detail_file, usecols=['Date'] + DETAIL_MEANS, chunksize=chunksize):
+        n_rows += len(chunk)
+        sums += chunk[DETAIL_MEANS].sum()
+        hit_dates.update(chunk.loc[chunk['Full_Hit'] == True, 'Date'])
+    means = sums / n_rows
+    return dict(means.items(), n_rows=n_rows, hit_days=len(hit_dates))
+
+
+def report_metrics(summary_file, detail_file, out_prefix):
+    """The run's metrics sidecar; rebuilt from the cached frames or the CSVs if it is missing or stale."""
+    metrics = load_metrics(out_prefix, summary_file)
+    if metrics is not None:
+        return metrics
+    # pandas and the result cache are only needed without a current sidecar
+    import pandas as pd
+    from result_cache import load_results
+    cached = load_results(out_prefix)
+    if cached is not None:
+        return build_metrics(cached['summary'], detail_metrics(cached['detail']))
+    return build_metrics(pd.read_csv(summary_file), detail_aggregates(detail_file))
+
+
 def generate_report(summary_file, detail_file, out_prefix):
-    summary_df = pd.read_csv(summary_file)
-    detail_df = pd.read_csv(detail_file, parse_dates=['Date'])
+    metrics = report_metrics(summary_file, detail_file, out_prefix)
+    detail = metrics['detail']
+    sources = metrics['sources']
+    extremes = metrics['extremes']
     
-    best_src = summary_df.iloc[0]
-    worst_src = summary_df.iloc[-1]
+    best_src = sources[0]
+    worst_src = sources[-1]
     
     report = f"""
 {'='*80}
@@ -23,9 +62,9 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 EXECUTIVE SUMMARY
 {'-'*80}
-Total Sources Tested: {len(summary_df)}
-Total Trading Days: {len(detail_df[detail_df['Full_Hit'] == True].groupby('Date').size())}
-Average Hit Rate (All Sources): {detail_df['Full_Hit'].mean()*100:.2f}%
+Total Sources Tested: {len(sources)}
+Total Trading Days: {detail['hit_days']}
+Average Hit Rate (All Sources): {detail['Full_Hit']*100:.2f}%
 Most Accurate Source: {best_src['Source']} ({best_src['Hit_Rate_%']:.2f}% hit rate)
 Least Accurate Source: {worst_src['Source']} ({worst_src['Hit_Rate_%']:.2f}% hit rate)
 
@@ -35,30 +74,30 @@ KEY METRICS EXPLAINED
 1. HIT RATE (%)
    - Definition: Percentage of days where actual High <= Predicted High AND actual Low >= Predicted Low
    - Interpretation: Higher is better (lucky to have hits at all with synthetic data)
-   - Current Average: {detail_df['Full_Hit'].mean()*100:.2f}%
+   - Current Average: {detail['Full_Hit']*100:.2f}%
 
 2. MISS RATES (%)
    - High Miss: Actual High exceeded Predicted High
    - Low Miss: Actual Low fell below Predicted Low
-   - Current High Miss Rate: {detail_df['High_Miss'].mean()*100:.2f}%
-   - Current Low Miss Rate: {detail_df['Low_Miss'].mean()*100:.2f}%
+   - Current High Miss Rate: {detail['High_Miss']*100:.2f}%
+   - Current Low Miss Rate: {detail['Low_Miss']*100:.2f}%
    - Insight: Nearly all predictions "miss low" (underestimate the low bound)
 
 3. ERROR METRICS (Points)
-   - Avg High Error: {detail_df['High_Error'].mean():.2f} pts (negative = underestimate)
-   - Avg Low Error: {detail_df['Low_Error'].mean():.2f} pts (positive = overestimate)
-   - Avg Total Error: {detail_df['Total_Error'].mean():.2f} pts
+   - Avg High Error: {detail['High_Error']:.2f} pts (negative = underestimate)
+   - Avg Low Error: {detail['Low_Error']:.2f} pts (positive = overestimate)
+   - Avg Total Error: {detail['Total_Error']:.2f} pts
 
 4. DIRECTIONAL BIAS
    - Definition: (Avg High Error - Avg Low Error)
    - Negative = Channel biased LOW (underestimates highs, overestimates lows)
    - Positive = Channel biased HIGH (overestimates highs, underestimates lows)
-   - Current Bias: {detail_df['High_Error'].mean() - detail_df['Low_Error'].mean():.2f} pts
+   - Current Bias: {detail['High_Error'] - detail['Low_Error']:.2f} pts
 
 TOP 5 PERFORMERS (by Hit Rate)
 {'-'*80}
 """
-    for idx, (i, row) in enumerate(summary_df.head(5).iterrows(), 1):
+    for idx, row in enumerate(sources[:5], 1):
         report += f"\n{idx}. {row['Source']}\n"
         report += f"   Hit Rate: {row['Hit_Rate_%']:.2f}% ({int(row['Hit_Count'])}/{int(row['N_Days'])} days)\n"
         report += f"   Avg Total Error: {row['Avg_Total_Error_pts']:.2f} pts\n"
@@ -70,7 +109,7 @@ TOP 5 PERFORMERS (by Hit Rate)
 BOTTOM 5 PERFORMERS (by Hit Rate)
 {'-'*80}
 """
-    for idx, (i, row) in enumerate(summary_df.tail(5).iloc[::-1].iterrows(), 1):
+    for idx, row in enumerate(sources[-5:][::-1], 1):
         report += f"\n{idx}. {row['Source']}\n"
         report += f"   Hit Rate: {row['Hit_Rate_%']:.2f}% ({int(row['Hit_Count'])}/{int(row['N_Days'])} days)\n"
         report += f"   Avg Total Error: {row['Avg_Total_Error_pts']:.2f} pts\n"
@@ -87,15 +126,15 @@ Range Coverage Pattern:
 
 Accuracy Comparison:
   Best Source (Hit Rate):      {best_src['Source']}: {best_src['Hit_Rate_%']:.2f}%
-  Average Hit Rate:             {detail_df['Full_Hit'].mean()*100:.2f}%
+  Average Hit Rate:             {detail['Full_Hit']*100:.2f}%
   Worst Source (Hit Rate):      {worst_src['Source']}: {worst_src['Hit_Rate_%']:.2f}%
   
-  Best Source (Abs Error):      {summary_df.loc[summary_df['Avg_Total_Error_pts'].idxmin(), 'Source']}: {summary_df['Avg_Total_Error_pts'].min():.2f} pts
-  Worst Source (Abs Error):     {summary_df.loc[summary_df['Avg_Total_Error_pts'].idxmax(), 'Source']}: {summary_df['Avg_Total_Error_pts'].max():.2f} pts
+  Best Source (Abs Error):      {extremes['best_error']['Source']}: {extremes['best_error']['value']:.2f} pts
+  Worst Source (Abs Error):     {extremes['worst_error']['Source']}: {extremes['worst_error']['value']:.2f} pts
 
 Bias Analysis:
-  Most Pessimistic (Lowest Bias):  {summary_df.loc[summary_df['Directional_Bias'].idxmin(), 'Source']}: {summary_df['Directional_Bias'].min():.2f} pts
-  Most Optimistic (Highest Bias):  {summary_df.loc[summary_df['Directional_Bias'].idxmax(), 'Source']}: {summary_df['Directional_Bias'].max():.2f} pts
+  Most Pessimistic (Lowest Bias):  {extremes['lowest_bias']['Source']}: {extremes['lowest_bias']['value']:.2f} pts
+  Most Optimistic (Highest Bias):  {extremes['highest_bias']['Source']}: {extremes['highest_bias']['value']:.2f} pts
   
   Interpretation: All sources show negative bias (biased LOW)
 
@@ -134,6 +173,7 @@ KEY INSIGHTS & RECOMMENDATIONS
 OUTPUT FILES GENERATED
 {'-'*80}
   - {os.path.basename(summary_file)}: Per-source summary metrics
+  - {out_prefix}_backtest_metrics.json: Aggregates behind this report
   - {os.path.basename(detail_file)}: Daily predictions + errors
   - {out_prefix}_backtest_dashboard.png: Visual comparison charts
   - {out_prefix}_cumulative_analysis.png: Time-series analysis
@@ -153,10 +193,12 @@ NEXT STEPS
     return report
 
 if __name__ == '__main__':
-    # Generate reports
-    for prefix in ['1year', '3year']:
+    # Generate reports for every instrument and period that has been backtested
+    for prefix in backtest_prefixes():
         summary_file = os.path.join(WORKDIR, f'{prefix}_backtest_summary.csv')
         detail_file = os.path.join(WORKDIR, f'{prefix}_backtest_detail.csv')
+        if not os.path.isfile(summary_file):
+            continue
         report = generate_report(summary_file, detail_file, prefix)
         
         report_file = os.path.join(WORKDIR, f'{prefix}_backtest_report.txt')
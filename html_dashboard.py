@@ -0,0 +1,293 @@
+"""
+Self-contained interactive HTML dashboard for the backtest results.
+Covers the panels of visualize_backtest.py (hit rate, absolute errors,
+directional bias, miss rates, cumulative hits, daily errors) and
+plot_both_periods.py (times selected as best with the within-range %), for
+every backtested partition.
+
+Per-source metrics are pre-aggregated here and every time series is reduced
+to a fixed point budget with LTTB (downsample.py), so the page embeds a few
+kB of JSON per partition whatever the history length, and draws it with a
+small inline SVG script: no external assets, it opens instantly offline.
+Legend entries toggle series; hovering a line chart reads out the values.
+"""
+import argparse
+import json
+import os
+import numpy as np
+
+from chart_render import published, short_name
+from downsample import downsample
+from instruments import backtest_prefixes
+from source_matrix import row_mean
+from visualize_backtest import load_backtest
+
+WORKDIR = os.path.dirname(__file__)
+OUT_FILE = os.path.join(WORKDIR, 'backtest_dashboard.html')
+DEFAULT_POINTS = 500
+SUMMARY_COLUMNS = ['Hit_Rate_%', 'Hit_Count', 'N_Days', 'Avg_Abs_High_Error_pts', 'Avg_Abs_Low_Error_pts',
+                   'Directional_Bias', 'High_Miss_%', 'Low_Miss_%']
+
+
+def day_numbers(dates):
+    import pandas as pd
+    return pd.to_datetime(pd.Series(dates)).to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def compact_series(dates, values, points):
+    """[[day numbers], [values]] of one series, LTTB-downsampled to `points`."""
+    x, y = downsample(day_numbers(dates), values, points)
+    return [x.tolist(), np.round(y, 2).tolist()]
+
+
+def partition_data(prefix, points=DEFAULT_POINTS):
+    """Embedded data of one backtested partition, or None if it has no backtest."""
+    import pandas as pd
+    summary_file = os.path.join(WORKDIR, f'{prefix}_backtest_summary.csv')
+    if not os.path.isfile(summary_file):
+        return None
+    matrix, summary_df = load_backtest(os.path.join(WORKDIR, f'{prefix}_backtest_detail.csv'), summary_file, prefix)
+    summary_df = summary_df.sort_values('Hit_Rate_%', ascending=False).reset_index(drop=True)
+    sources = summary_df['Source'].astype(str).tolist()
+    cumulative = {s: published(matrix, 'Cumulative_Hits', s) for s in sources}
+    error = {s: published(matrix, 'Total_Error', s) for s in sources}
+    data = {
+        'prefix': prefix,
+        'sources': [short_name(s, prefix) for s in sources],
+        'summary': {c: summary_df[c].round(2).tolist() for c in SUMMARY_COLUMNS},
+        'cumulative': [compact_series(cumulative[s]['Date'], cumulative[s]['Cumulative_Hits'], points) for s in sources],
+        'error': [compact_series(error[s]['Date'], error[s]['Total_Error'], points) for s in sources],
+        'mean_error': [round(float(row_mean(error[s], 'Total_Error')), 2) for s in sources],
+        'n_rows': int(summary_df['N_Days'].sum()),
+        'best_counts': None,
+    }
+    best_file = os.path.join(WORKDIR, f'{prefix}_best_source_summary.csv')
+    if os.path.isfile(best_file):
+        best = pd.read_csv(best_file).sort_values('Count', ascending=False)
+        data['best_counts'] = {'sources': [short_name(s) for s in best['Best_Source']],
+                               'count': best['Count'].astype(int).tolist(),
+                               'within': best['WithinPct'].round(2).tolist()}
+    return data
+
+
+def render_html(partitions, points):
+    payload = json.dumps({'points': points, 'partitions': partitions}, separators=(',', ':'))
+    # keep '</script>' out of the embedded JSON
+    return PAGE.replace('__DATA__', payload.replace('</', '<\\/'))
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Write an interactive HTML dashboard of every backtested partition')
+    p.add_argument('--points', type=int, default=DEFAULT_POINTS,
+                   help='Point budget per time series (LTTB downsampling)')
+    p.add_argument('--out', default=OUT_FILE, help='Output HTML file')
+    return p.parse_args()
+
+
+PAGE = r'''<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Nifty 50 Prediction Backtest Dashboard</title>
+<style>
+body { font-family: -apple-system, "Segoe UI", Helvetica, Arial, sans-serif; margin: 20px; color: #222; background: #fafafa; }
+h1 { font-size: 22px; margin: 0 0 10px; }
+.bar { margin-bottom: 14px; }
+.grid2 { display: flex; flex-wrap: wrap; gap: 14px; }
+.panel { background: #fff; border: 1px solid #ddd; border-radius: 6px; padding: 8px 10px; }
+.panel h3 { font-size: 14px; margin: 2px 0 4px; }
+svg text { font-size: 11px; fill: #333; }
+svg .grid { stroke: #e5e5e5; }
+svg .axis { stroke: #999; }
+svg .legend { cursor: pointer; }
+svg .off { opacity: 0.35; }
+.note { color: #666; font-size: 12px; }
+</style>
+</head>
+<body>
+<h1>Nifty 50 Prediction Backtest Dashboard</h1>
+<div class="bar">Partition: <select id="partition"></select> <span class="note" id="note"></span></div>
+<div id="charts" class="grid2"></div>
+<script>
+const D = __DATA__;
+const NS = 'http://www.w3.org/2000/svg';
+const W = 720, H = 330, M = {l: 64, r: 56, t: 16, b: 96};
+const PALETTE = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'];
+
+function el(tag, attrs, parent) {
+  const e = document.createElementNS(NS, tag);
+  for (const k in attrs) e.setAttribute(k, attrs[k]);
+  if (parent) parent.appendChild(e);
+  return e;
+}
+function text(parent, x, y, s, attrs) {
+  const t = el('text', Object.assign({x: x, y: y}, attrs || {}), parent);
+  t.textContent = s;
+  return t;
+}
+function tip(node, s) { el('title', {}, node).textContent = s; }
+function fmt(v) { return Math.abs(v) >= 1000 ? v.toFixed(0) : v.toFixed(2); }
+function day(d) { return new Date(d * 864e5).toISOString().slice(0, 10); }
+function scale(d0, d1, r0, r1) { const k = d1 === d0 ? 0 : (r1 - r0) / (d1 - d0); return v => r0 + (v - d0) * k; }
+function extent(arrays, withZero) {
+  let lo = Infinity, hi = -Infinity;
+  for (const a of arrays) for (const v of a) { if (v < lo) lo = v; if (v > hi) hi = v; }
+  if (withZero) { lo = Math.min(lo, 0); hi = Math.max(hi, 0); }
+  if (!isFinite(lo)) { lo = 0; hi = 1; }
+  if (lo === hi) { lo -= 1; hi += 1; }
+  return [lo, hi];
+}
+function panel(title, height) {
+  const box = document.createElement('div');
+  box.className = 'panel';
+  const h = document.createElement('h3');
+  h.textContent = title;
+  box.appendChild(h);
+  document.getElementById('charts').appendChild(box);
+  return el('svg', {viewBox: `0 0 ${W} ${height}`, width: W, height: height}, box);
+}
+function yAxis(s, y, lo, hi, right) {
+  for (let i = 0; i <= 5; i++) {
+    const v = lo + (hi - lo) * i / 5;
+    if (right) { text(s, W - M.r + 6, y(v) + 4, fmt(v)); continue; }
+    el('line', {x1: M.l, x2: W - M.r, y1: y(v), y2: y(v), 'class': 'grid'}, s);
+    text(s, M.l - 6, y(v) + 4, fmt(v), {'text-anchor': 'end'});
+  }
+}
+function legend(s, items, onToggle) {
+  let x = M.l;
+  items.forEach((it, i) => {
+    const g = el('g', {'class': 'legend' + (it.visible === false ? ' off' : '')}, s);
+    el('rect', {x: x, y: 2, width: 10, height: 10, fill: it.color}, g);
+    const t = text(g, x + 14, 11, it.name);
+    x += 24 + 6.2 * it.name.length;
+    if (onToggle) g.addEventListener('click', () => onToggle(i));
+  });
+}
+
+// vertical (grouped) bars over `labels`, with an optional reference line and right-axis line
+function bars(title, labels, series, opts) {
+  opts = opts || {};
+  const s = panel(title, H);
+  const [lo, hi] = extent(series.map(d => d.values), true);
+  const y = scale(lo, hi, H - M.b, M.t + 14);
+  yAxis(s, y, lo, hi);
+  const band = (W - M.l - M.r) / labels.length, bw = band * 0.8 / series.length;
+  labels.forEach((lab, i) => {
+    series.forEach((d, j) => {
+      const v = d.values[i];
+      const r = el('rect', {x: M.l + i * band + band * 0.1 + j * bw, y: Math.min(y(v), y(0)), width: bw,
+                            height: Math.max(Math.abs(y(v) - y(0)), 0.5),
+                            fill: typeof d.color === 'function' ? d.color(v, i) : d.color, opacity: 0.8}, s);
+      tip(r, `${lab} | ${d.name}: ${fmt(v)}`);
+    });
+    const cx = M.l + (i + 0.5) * band;
+    text(s, cx, H - M.b + 14, lab, {'text-anchor': 'end', transform: `rotate(-40 ${cx} ${H - M.b + 14})`});
+  });
+  el('line', {x1: M.l, x2: W - M.r, y1: y(0), y2: y(0), 'class': 'axis'}, s);
+  const items = series.map(d => ({name: d.name, color: typeof d.color === 'function' ? '#888' : d.color}));
+  if (opts.ref !== undefined) {
+    el('line', {x1: M.l, x2: W - M.r, y1: y(opts.ref), y2: y(opts.ref), stroke: 'blue', 'stroke-dasharray': '6 4', 'stroke-width': 2}, s);
+    items.push({name: `${opts.refName} (${fmt(opts.ref)})`, color: 'blue'});
+  }
+  if (opts.line) {
+    const [l0, l1] = extent([opts.line.values], true);
+    const y2 = scale(l0, l1, H - M.b, M.t + 14);
+    yAxis(s, y2, l0, l1, true);
+    const pts = opts.line.values.map((v, i) => `${M.l + (i + 0.5) * band},${y2(v)}`);
+    el('polyline', {points: pts.join(' '), fill: 'none', stroke: opts.line.color, 'stroke-width': 2}, s);
+    opts.line.values.forEach((v, i) => tip(el('circle', {cx: M.l + (i + 0.5) * band, cy: y2(v), r: 4, fill: opts.line.color}, s),
+                                           `${labels[i]} | ${opts.line.name}: ${fmt(v)}`));
+    items.push({name: opts.line.name, color: opts.line.color});
+  }
+  legend(s, items);
+}
+
+// date-axis line chart; legend toggles series, hovering reads out the nearest points
+function lines(title, series, opts) {
+  opts = opts || {};
+  const h = H + 10;
+  const s = panel(title, h);
+  const draw = () => {
+    while (s.firstChild) s.removeChild(s.firstChild);
+    const shown = series.filter(d => d.visible);
+    const [x0, x1] = extent(series.map(d => d.x));
+    const [lo, hi] = extent(shown.map(d => d.y).concat(shown.map(d => d.ref !== undefined ? [d.ref] : [])), opts.zero);
+    const x = scale(x0, x1, M.l, W - M.r), y = scale(lo, hi, h - 60, M.t + 14);
+    yAxis(s, y, lo, hi);
+    for (let i = 0; i <= 4; i++) {
+      const d = x0 + (x1 - x0) * i / 4;
+      text(s, x(d), h - 40, day(Math.round(d)), {'text-anchor': 'middle'});
+    }
+    shown.forEach(d => {
+      el('path', {d: 'M' + d.x.map((v, i) => `${x(v).toFixed(1)},${y(d.y[i]).toFixed(1)}`).join('L'),
+                  fill: 'none', stroke: d.color, 'stroke-width': 1.6}, s);
+      if (d.ref !== undefined)
+        el('line', {x1: M.l, x2: W - M.r, y1: y(d.ref), y2: y(d.ref), stroke: d.color, 'stroke-dasharray': '6 4'}, s);
+    });
+    legend(s, series, i => { series[i].visible = !series[i].visible; draw(); });
+    const cursor = el('line', {y1: M.t + 14, y2: h - 60, stroke: '#aaa', visibility: 'hidden'}, s);
+    const readout = text(s, M.l + 4, h - 8, '');
+    s.onmousemove = ev => {
+      const r = s.getBoundingClientRect();
+      const px = (ev.clientX - r.left) * W / r.width;
+      if (px < M.l || px > W - M.r || !shown.length) return;
+      const d = x0 + (px - M.l) / (W - M.r - M.l) * (x1 - x0);
+      cursor.setAttribute('x1', px); cursor.setAttribute('x2', px); cursor.setAttribute('visibility', 'visible');
+      readout.textContent = day(Math.round(d)) + '  ' + shown.map(sr => {
+        let lo = 0, hi = sr.x.length - 1;
+        while (lo < hi) { const mid = (lo + hi) >> 1; if (sr.x[mid] < d) lo = mid + 1; else hi = mid; }
+        if (lo > 0 && d - sr.x[lo - 1] < sr.x[lo] - d) lo -= 1;
+        return `${sr.name}: ${fmt(sr.y[lo])}`;
+      }).join('  ');
+    };
+  };
+  draw();
+}
+
+function show(p) {
+  document.getElementById('charts').innerHTML = '';
+  const S = p.summary, names = p.sources;
+  document.getElementById('note').textContent =
+    `${p.n_rows} source-days, ${names.length} sources; time series downsampled (LTTB) to at most ${D.points} points`;
+  const mean = S['Hit_Rate_%'].reduce((a, b) => a + b, 0) / names.length;
+  bars('Hit Rate by Source (%)', names, [{name: 'Hit Rate %', values: S['Hit_Rate_%'],
+        color: v => v > 4 ? 'green' : v > 3 ? 'orange' : 'red'}], {ref: mean, refName: 'Average'});
+  bars('Average Absolute Errors by Source (pts)', names, [
+    {name: 'Avg Abs High Error', values: S['Avg_Abs_High_Error_pts'], color: PALETTE[0]},
+    {name: 'Avg Abs Low Error', values: S['Avg_Abs_Low_Error_pts'], color: PALETTE[1]}]);
+  bars('Directional Bias (Negative = Underestimates High)', names, [{name: 'Bias (pts)', values: S['Directional_Bias'],
+        color: v => v < 0 ? 'red' : 'blue'}]);
+  bars('Miss Rate Breakdown (Top 10 Sources)', names.slice(0, 10), [
+    {name: 'High Miss %', values: S['High_Miss_%'].slice(0, 10), color: 'coral'},
+    {name: 'Low Miss %', values: S['Low_Miss_%'].slice(0, 10), color: 'skyblue'}]);
+  lines('Cumulative Hits Over Time (top 3 shown; click the legend for others)', names.map((n, i) => ({
+    name: n, x: p.cumulative[i][0], y: p.cumulative[i][1], color: PALETTE[i % 10], visible: i < 3})), {zero: true});
+  lines('Daily Total Error (best source shown; dashed = average)', names.map((n, i) => ({
+    name: n, x: p.error[i][0], y: p.error[i][1], ref: p.mean_error[i], color: PALETTE[i % 10], visible: i === 0})));
+  if (p.best_counts) {
+    const B = p.best_counts;
+    bars('Times Selected as Best (closest to actual High/Low)', B.sources,
+         [{name: 'Times Selected as Best', values: B.count, color: '#1f77b4'}],
+         {line: {name: 'Within Range %', values: B.within, color: '#ff7f0e'}});
+  }
+}
+
+const select = document.getElementById('partition');
+D.partitions.forEach((p, i) => { const o = document.createElement('option'); o.value = i; o.textContent = p.prefix; select.appendChild(o); });
+select.addEventListener('change', () => show(D.partitions[select.value]));
+if (D.partitions.length) show(D.partitions[0]);
+</script>
+</body>
+</html>
+'''
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    partitions = [d for d in (partition_data(prefix, args.points) for prefix in backtest_prefixes()) if d is not None]
+    html = render_html(partitions, args.points)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        f.write(html)
+    print(f'✅ Saved dashboard: {os.path.basename(args.out)} ({len(html) / 1024:.0f} kB, '
+          f'{len(partitions)} partition(s), ≤{args.points} points per series)')
@@ -0,0 +1,88 @@
+"""
+Instrument (symbol) registry for the backtest pipeline.
+Each symbol has its own daily OHLC file and a glob pattern for its news-source
+files (`{period}` is filled with '1year', '3year', or '*'). NIFTY is built in;
+more symbols (Bank Nifty, Sensex, single stocks) are added in `instruments.json`
+next to the scripts:
+
+    {"BANKNIFTY": {"ohlc": "BANKNIFTY_daily.csv", "sources": "*banknifty_{period}.csv",
+                   "aliases": ["Bank Nifty", "Nifty Bank"]},
+     "SENSEX": {"ohlc": "SENSEX_daily.csv", "aliases": ["Sensex"]}}
+
+`aliases` map the asset names used in multi-asset files (the `Asset` column of
+the premarket trade setups) to the symbol. NIFTY keeps the historical file
+names (`merged_predictions_1year.csv`, `1year_backtest_*.csv`); every other
+symbol's outputs are prefixed with the symbol, e.g. `BANKNIFTY_1year`.
+"""
+import glob
+import json
+import os
+
+WORKDIR = os.path.dirname(__file__)
+CONFIG_FILE = os.path.join(WORKDIR, 'instruments.json')
+DEFAULT_SYMBOL = 'NIFTY'
+NIFTY_FILE = os.path.join(WORKDIR, 'NIFTY_50-29-11-2024-to-29-11-2025_csv__NIFTY_50-29-11-2024-to-29-11-20.csv')
+PERIODS = ('1year', '3year')
+
+BUILTIN = {
+    DEFAULT_SYMBOL: {'ohlc': NIFTY_FILE, 'sources': '*nifty50_{period}.csv', 'aliases': ['Nifty 50', 'Nifty']},
+}
+
+
+def load_instruments(path=CONFIG_FILE):
+    """Built-in instruments plus those configured in `path`, keyed by upper-case symbol."""
+    instruments = {k: dict(v) for k, v in BUILTIN.items()}
+    if os.path.isfile(path):
+        with open(path, encoding='utf-8') as f:
+            for symbol, entry in json.load(f).items():
+                entry = dict(entry)
+                entry['ohlc'] = os.path.join(WORKDIR, entry['ohlc'])
+                entry.setdefault('sources', f'*{symbol.lower()}_{{period}}.csv')
+                entry.setdefault('aliases', [])
+                instruments[symbol.upper()] = entry
+    return instruments
+
+
+def select(symbols=None, path=CONFIG_FILE):
+    """The requested symbols (all configured ones by default) as {symbol: entry}."""
+    instruments = load_instruments(path)
+    if not symbols:
+        return instruments
+    unknown = [s for s in symbols if s.upper() not in instruments]
+    if unknown:
+        raise ValueError(f'Unknown symbol(s): {", ".join(unknown)}; configure them in {os.path.basename(path)}')
+    return {s.upper(): instruments[s.upper()] for s in symbols}
+
+
+def symbol_prefix(symbol, period):
+    """Output prefix of one (symbol, period) partition."""
+    return period if symbol == DEFAULT_SYMBOL else f'{symbol}_{period}'
+
+
+def backtest_prefixes(symbols=None):
+    """Output prefixes of every (symbol, period) partition."""
+    return [symbol_prefix(symbol, period) for symbol in select(symbols) for period in PERIODS]
+
+
+def merged_name(symbol, period):
+    return f'merged_predictions_{symbol_prefix(symbol, period)}.csv'
+
+
+def source_files(entry, period, exclude=()):
+    """News-source files of an instrument for `period`, sorted, without its OHLC file or `exclude`."""
+    skip = {os.path.basename(entry['ohlc'])} | {os.path.basename(e) for e in exclude}
+    pattern = entry['sources'].format(period=period)
+    return sorted(f for f in glob.glob(os.path.join(WORKDIR, pattern)) if os.path.basename(f) not in skip)
+
+
+def asset_symbols(instruments):
+    """{normalized asset name: symbol} for matching the Asset column of multi-asset files."""
+    names = {}
+    for symbol, entry in instruments.items():
+        for name in [symbol] + list(entry.get('aliases', [])):
+            names[normalize_asset(name)] = symbol
+    return names
+
+
+def normalize_asset(name):
+    return ''.join(ch for ch in str(name).upper() if ch.isalnum())
@@ -0,0 +1,183 @@
+"""
+Intraday first-touch backtest on minute bars.
+For every source-day prediction, finds the first minute the market traded at
+or below the predicted support and at or above the predicted resistance, which
+side broke first, and the minutes from the open to each touch.
+
+Minute bars are laid out once as a day × bar matrix (padded to the longest
+session); running max of High and running min of Low along each day make the
+first touch of a level an `argmax` over a boolean row, for all predictions at
+once.
+"""
+import argparse
+import os
+import time
+import numpy as np
+
+from csv_cache import load_csv
+from merged_table import DATE_NA, expand_dates, load_merged
+from schema_registry import find_column, ohlc_schema, parse_dates
+
+WORKDIR = os.path.dirname(__file__)
+
+FIRST_BREACH = ['NONE', 'SUPPORT', 'RESISTANCE', 'BOTH_SAME_BAR', 'NO_DATA']
+TIME_FORMATS = ['%H:%M:%S', '%H:%M']
+
+
+def bar_timestamps(df, schema):
+    """Bar timestamps from one datetime column, or a date column plus a time column."""
+    date_col = schema['date']
+    time_col = find_column([c for c in df.columns if c != date_col], 'time')
+    if time_col is None:
+        return parse_dates(df[date_col], schema['date_format'])
+    stamp = df[date_col].astype(str) + ' ' + df[time_col].astype(str)
+    if schema['date_format'] is not None:
+        # the registered date format plus whichever time format fits the sample
+        sample = stamp.head(50)
+        for tf in TIME_FORMATS:
+            fmt = f"{schema['date_format']} {tf}"
+            if parse_dates(sample, fmt).notna().all():
+                return parse_dates(stamp, fmt)
+    return parse_dates(stamp)
+
+
+class MinuteBars:
+    """Minute bars of one instrument as day × bar matrices."""
+
+    def __init__(self, days, minutes, high, low):
+        self.days = days          # sorted int64 day numbers, one per matrix row
+        self.minutes = minutes    # minutes since midnight, -1 where padded
+        self.high = high
+        self.low = low
+        # running extremes within each day; padding never touches anything
+        self.cum_high = np.maximum.accumulate(np.where(np.isnan(high), -np.inf, high), axis=1)
+        self.cum_low = np.minimum.accumulate(np.where(np.isnan(low), np.inf, low), axis=1)
+
+    @classmethod
+    def from_frame(cls, df, schema):
+        import pandas as pd
+        ts = bar_timestamps(df, schema).to_numpy(dtype='datetime64[ns]')
+        valid = np.flatnonzero(~np.isnat(ts))
+        order = valid[np.argsort(ts[valid], kind='stable')]
+        ts = ts[order]
+        high = pd.to_numeric(df[schema['fields']['High']], errors='coerce').to_numpy(dtype=float)[order]
+        low = pd.to_numeric(df[schema['fields']['Low']], errors='coerce').to_numpy(dtype=float)[order]
+
+        day = ts.astype('datetime64[D]')
+        minute = ((ts - day) // np.timedelta64(1, 'm')).astype(np.int64)
+        days, row, counts = np.unique(day.astype(np.int64), return_inverse=True, return_counts=True)
+        col = np.arange(len(ts)) - np.repeat(np.cumsum(counts) - counts, counts)
+        width = int(counts.max()) if len(counts) else 0
+        minutes = np.full((len(days), width), -1, dtype=np.int64)
+        highs = np.full((len(days), width), np.nan)
+        lows = np.full((len(days), width), np.nan)
+        minutes[row, col] = minute
+        highs[row, col] = high
+        lows[row, col] = low
+        return cls(days, minutes, highs, lows)
+
+    @classmethod
+    def from_csv(cls, path):
+        df = load_csv(path)
+        schema = ohlc_schema(path, df)
+        if schema['date'] is None or schema['fields']['High'] is None or schema['fields']['Low'] is None:
+            raise ValueError(f'No date/High/Low columns in minute-bar file {path}')
+        return cls.from_frame(df, schema)
+
+    def day_rows(self, days):
+        """Matrix row of each day number, or -1 where there are no bars that day."""
+        days = np.asarray(days, dtype=np.int64)
+        if len(self.days) == 0:
+            return np.full(len(days), -1)
+        pos = np.searchsorted(self.days, days).clip(0, len(self.days) - 1)
+        return np.where(self.days[pos] == days, pos, -1)
+
+
+def first_touch(cum, levels, rows, above):
+    """Bar index of the first running extreme reaching `levels`, -1 if never reached."""
+    found = rows >= 0
+    idx = np.full(len(levels), -1)
+    if not found.any():
+        return idx
+    path = cum[rows[found]]
+    lv = np.asarray(levels, dtype=float)[found][:, None]
+    hit = path >= lv if above else path <= lv
+    idx[found] = np.where(hit.any(axis=1), hit.argmax(axis=1), -1)
+    return idx
+
+
+def touch_table(bars, days, support, resistance):
+    """First-touch bar, time and minutes-from-open of support and resistance per prediction."""
+    import pandas as pd
+    rows = bars.day_rows(days)
+    sup_idx = first_touch(bars.cum_low, support, rows, above=False)
+    res_idx = first_touch(bars.cum_high, resistance, rows, above=True)
+    safe_rows = np.maximum(rows, 0)
+    open_minute = bars.minutes[safe_rows, 0]
+
+    out = {}
+    for name, idx in (('Support', sup_idx), ('Resistance', res_idx)):
+        touched = idx >= 0
+        minute = pd.Series(bars.minutes[safe_rows, np.maximum(idx, 0)])
+        clock = minute.floordiv(60).astype(str).str.zfill(2) + ':' + minute.mod(60).astype(str).str.zfill(2)
+        out[f'{name}_Touched'] = touched
+        out[f'{name}_Touch_Time'] = clock.where(touched, None).to_numpy()
+        out[f'{name}_Minutes_To_Touch'] = np.where(touched, minute - open_minute, np.nan)
+
+    codes = np.select(
+        [rows < 0,
+         (sup_idx >= 0) & (sup_idx == res_idx),
+         (sup_idx >= 0) & ((res_idx < 0) | (sup_idx < res_idx)),
+         res_idx >= 0],
+        [4, 3, 1, 2], default=0)
+    out['First_Breach'] = pd.Categorical.from_codes(codes, categories=FIRST_BREACH)
+    minutes_first = np.fmin(out['Support_Minutes_To_Touch'], out['Resistance_Minutes_To_Touch'])
+    out['Minutes_To_First_Breach'] = minutes_first
+    return pd.DataFrame(out)
+
+
+def run_intraday(merged_file, bars_file, out_prefix):
+    """First-touch table for every prediction in `merged_file` against `bars_file`."""
+    import pandas as pd
+    t0 = time.perf_counter()
+    bars = MinuteBars.from_csv(bars_file)
+    preds = load_merged(merged_file)
+    preds = preds[preds['Date'] != DATE_NA].reset_index(drop=True)
+    touches = touch_table(bars, preds['Date'].to_numpy(dtype=np.int64),
+                          preds['Support'].to_numpy(dtype=float), preds['Resistance'].to_numpy(dtype=float))
+    detail = pd.concat([
+        pd.DataFrame({'Date': expand_dates(preds['Date']).to_numpy(), 'Source': preds['Source'].to_numpy(),
+                      'Pred_Low': preds['Support'].to_numpy(), 'Pred_High': preds['Resistance'].to_numpy()}),
+        touches], axis=1)
+    elapsed = time.perf_counter() - t0
+
+    scored = detail[detail['First_Breach'] != 'NO_DATA']
+    first = pd.get_dummies(scored['First_Breach']).astype(float) * 100
+    first['Source'] = scored['Source']
+    summary = first.groupby('Source').mean().round(2)[['SUPPORT', 'RESISTANCE', 'BOTH_SAME_BAR', 'NONE']]
+    summary.columns = ['Support_First_%', 'Resistance_First_%', 'Same_Bar_%', 'No_Breach_%']
+    summary.insert(0, 'N_Days', scored.groupby('Source').size())
+    summary['Median_Minutes_To_First_Breach'] = scored.groupby('Source')['Minutes_To_First_Breach'].median()
+    summary = summary.reset_index()
+
+    detail_file = os.path.join(WORKDIR, f'{out_prefix}_intraday_touch_detail.csv')
+    summary_file = os.path.join(WORKDIR, f'{out_prefix}_intraday_touch_summary.csv')
+    detail.to_csv(detail_file, index=False)
+    summary.to_csv(summary_file, index=False)
+    print(f'Matched {len(scored)}/{len(detail)} predictions to {len(bars.days)} days of minute bars in {elapsed:.2f}s')
+    print(f'✅ Saved intraday detail: {os.path.basename(detail_file)}')
+    print(f'✅ Saved intraday summary: {os.path.basename(summary_file)}')
+    print(summary.to_string(index=False))
+    return detail, summary
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='First-touch backtest of predicted ranges on minute bars')
+    p.add_argument('bars', help='Minute-bar OHLC CSV (a Date/Datetime column, or Date plus Time)')
+    p.add_argument('--prefix', default='1year', help='Reads merged_predictions_<prefix>.csv')
+    return p.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    run_intraday(os.path.join(WORKDIR, f'merged_predictions_{args.prefix}.csv'), args.bars, args.prefix)
@@ -0,0 +1,77 @@
+"""
+Typed schema for the merged prediction table (`merged_predictions_*.csv`).
+In memory the table is kept compact:
+  - Source as a pandas Categorical (int codes + one lookup table of file names)
+  - Date as int32 day numbers since 1970-01-01 (DATE_NA for unparseable dates)
+  - prices as float32 wherever that round-trips exactly, float64 otherwise
+`save_merged` writes the CSV plus a typed Parquet copy under `.cache/`, and
+`load_merged` returns the compact frame from that copy while it is up to date.
+"""
+import numpy as np
+import os
+
+from csv_cache import cache_paths, load_csv
+from ohlc_store import NAT_DAY, to_day_numbers
+
+COLUMNS = ['Date', 'Source', 'Support', 'Resistance', 'RangeWidth', 'RangeMid', 'Market_High', 'Market_Low']
+PRICE_COLUMNS = ['Support', 'Resistance', 'RangeWidth', 'RangeMid', 'Market_High', 'Market_Low']
+DATE_NA = np.iinfo(np.int32).min
+
+
+def narrow_float(col):
+    """float32 if every value survives the round trip, else float64."""
+    import pandas as pd
+    values = col.to_numpy(dtype=np.float64)
+    narrow = values.astype(np.float32)
+    if np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+        return pd.Series(narrow, index=col.index)
+    return pd.Series(values, index=col.index)
+
+
+def compact_merged(df):
+    """Convert a merged prediction frame to the compact in-memory schema."""
+    import pandas as pd
+    out = df.copy()
+    if not pd.api.types.is_integer_dtype(out['Date']):
+        days = to_day_numbers(out['Date'])
+        out['Date'] = np.where(days == NAT_DAY, DATE_NA, days).astype(np.int32)
+    out['Source'] = out['Source'].astype('category')
+    for c in PRICE_COLUMNS:
+        if c in out.columns:
+            out[c] = narrow_float(out[c])
+    return out
+
+
+def expand_dates(days):
+    """int32 day numbers back to a datetime64 Series (e.g. for CSV output or `.dt` access)."""
+    import pandas as pd
+    d = np.asarray(days, dtype=np.int64)
+    ts = np.where(d == DATE_NA, np.datetime64('NaT'), d.astype('datetime64[D]')).astype('datetime64[ns]')
+    return pd.Series(ts, index=getattr(days, 'index', None))
+
+
+def typed_path(path):
+    return os.path.splitext(cache_paths(path)[0])[0] + '.typed.parquet'
+
+
+def save_merged(df, path):
+    """Write a compact merged frame as CSV (ISO dates) and as typed Parquet."""
+    df.assign(Date=expand_dates(df['Date'])).to_csv(path, index=False, date_format='%Y-%m-%d')
+    try:
+        os.makedirs(os.path.dirname(typed_path(path)), exist_ok=True)
+        df.to_parquet(typed_path(path), index=False)
+    except (ImportError, OSError, TypeError, ValueError):
+        pass
+
+
+def load_merged(path):
+    """Load a merged predictions file in the compact schema."""
+    import pandas as pd
+    tp = typed_path(path)
+    if os.path.isfile(tp) and os.path.getmtime(tp) >= os.path.getmtime(path):
+        try:
+            return pd.read_parquet(tp)
+        except (ImportError, OSError, ValueError):
+            pass
+    # CSV changed since the typed copy (e.g. an incremental append)
+    return compact_merged(load_csv(path))
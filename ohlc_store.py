@@ -0,0 +1,143 @@
+"""
+Indexed OHLC store for the NIFTY history file.
+The file is normalized once into a sorted int64 day-number array plus float
+arrays for Open/High/Low/Close, so joining any number of prediction dates is a
+single `searchsorted` instead of one `.loc` per row. Stores can be saved to a
+memory-mappable `.npy` file and reopened without touching the CSV.
+"""
+import numpy as np
+import os
+
+from csv_cache import cache_paths, load_csv
+from schema_registry import infer_ohlc_schema, ohlc_schema, parse_dates
+
+FIELDS = ('Open', 'High', 'Low', 'Close')
+DTYPE = np.dtype([('Day', 'i8')] + [(f, 'f8') for f in FIELDS])
+NAT_DAY = np.iinfo(np.int64).min
+
+
+def to_day_numbers(dates, fmt=None):
+    """Convert dates (strings, `date` objects, datetimes) to int64 days since 1970-01-01.
+
+    Unparseable dates map to the NaT sentinel and never match a stored day.
+    """
+    import pandas as pd
+    if not isinstance(dates, pd.Series):
+        dates = pd.Series(dates, dtype=object)
+    ts = parse_dates(dates, fmt)
+    return ts.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+
+
+def from_day_numbers(days):
+    """Convert int64 day numbers back to `datetime.date` objects."""
+    import pandas as pd
+    return pd.to_datetime(np.asarray(days).astype('datetime64[D]')).date
+
+
+class OHLCStore:
+    """Daily OHLC bars keyed by day number, sorted and de-duplicated."""
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def from_frame(cls, df, schema=None):
+        import pandas as pd
+        if schema is None:
+            schema = infer_ohlc_schema(df)
+        if schema['date'] is None:
+            raise ValueError('No date column in NIFTY file')
+        days = to_day_numbers(df[schema['date']], schema['date_format'])
+        valid = days != NAT_DAY
+        data = np.empty(int(valid.sum()), dtype=DTYPE)
+        data['Day'] = days[valid]
+        for f in FIELDS:
+            col = schema['fields'].get(f)
+            if col is None:
+                data[f] = np.nan
+            else:
+                data[f] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)[valid]
+        # keep the first bar for a repeated date
+        data = data[np.argsort(data['Day'], kind='stable')]
+        keep = np.ones(len(data), dtype=bool)
+        keep[1:] = data['Day'][1:] != data['Day'][:-1]
+        return cls(data[keep])
+
+    @classmethod
+    def from_csv(cls, path):
+        df = load_csv(path)
+        return cls.from_frame(df, ohlc_schema(path, df))
+
+    @classmethod
+    def open(cls, path):
+        """Open the store for a CSV, reusing its memory-mapped binary when it is up to date."""
+        bin_path = os.path.splitext(cache_paths(path)[0])[0] + '.ohlc.npy'
+        if os.path.isfile(bin_path) and os.path.getmtime(bin_path) >= os.path.getmtime(path):
+            try:
+                return cls.load(bin_path)
+            except (OSError, ValueError):
+                pass
+        store = cls.from_csv(path)
+        try:
+            store.save(bin_path)
+        except OSError:
+            pass
+        return store
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + '.tmp.npy'
+        np.save(tmp_path, self.data)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        data = np.load(path, mmap_mode='r' if mmap else None)
+        if data.dtype != DTYPE:
+            raise ValueError(f'Not an OHLC store: {path}')
+        return cls(data)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def days(self):
+        return self.data['Day']
+
+    def positions(self, dates):
+        """Row position of each date in the store, or -1 where the date has no bar."""
+        return self.day_positions(to_day_numbers(dates))
+
+    def day_positions(self, q):
+        """Like `positions`, for int64 day numbers."""
+        q = np.asarray(q, dtype=np.int64)
+        days = self.days
+        if len(days) == 0:
+            return np.full(len(q), -1)
+        pos = np.searchsorted(days, q).clip(0, len(days) - 1)
+        return np.where(days[pos] == q, pos, -1)
+
+    def lookup(self, dates, fields=FIELDS):
+        """Return a DataFrame of `fields` aligned to `dates`; missing dates are NaN."""
+        return self._gather(self.positions(dates), fields)
+
+    def lookup_days(self, days, fields=FIELDS):
+        """Like `lookup`, for int64 day numbers."""
+        return self._gather(self.day_positions(days), fields)
+
+    def _gather(self, pos, fields):
+        import pandas as pd
+        found = pos >= 0
+        out = {}
+        for f in fields:
+            col = np.full(len(pos), np.nan)
+            col[found] = self.data[f][pos[found]]
+            out[f] = col
+        return pd.DataFrame(out)
+
+    def to_frame(self):
+        """Date/Open/High/Low/Close frame with `datetime.date` dates, like the old loaders."""
+        import pandas as pd
+        df = pd.DataFrame({f: np.asarray(self.data[f]) for f in FIELDS})
+        df.insert(0, 'Date', from_day_numbers(self.days))
+        return df
@@ -1,10 +1,9 @@
 #!/usr/bin/env python3
 import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import os
 
+from chart_render import best_count_spec, render
+
 WORKDIR = os.path.dirname(__file__)
 IN_FILE = os.path.join(WORKDIR, 'best_source_summary.csv')
 OUT_IMG = os.path.join(WORKDIR, 'best_source_counts.png')
@@ -14,29 +13,13 @@ if not os.path.isfile(IN_FILE):
     raise SystemExit(1)
 
 df = pd.read_csv(IN_FILE)
-# Sort by Count descending
-plot_df = df.sort_values('Count', ascending=False).reset_index(drop=True)
-
-# Create bar chart for Count and line for WithinPct
-fig, ax = plt.subplots(figsize=(12,6))
-ax.bar(plot_df['Best_Source'], plot_df['Count'], color='tab:blue')
-ax.set_xlabel('News Source')
-ax.set_ylabel('Best Count (number of days chosen as best)', color='tab:blue')
-ax.tick_params(axis='y', labelcolor='tab:blue')
-ax.set_xticklabels(plot_df['Best_Source'], rotation=45, ha='right')
-
-# Secondary axis for WithinPct
-ax2 = ax.twinx()
-ax2.plot(plot_df['Best_Source'], plot_df['WithinPct'], color='tab:orange', marker='o')
-ax2.set_ylabel('WithinRange % (of days chosen)', color='tab:orange')
-ax2.tick_params(axis='y', labelcolor='tab:orange')
-
-plt.title('Best Source Count and %WithinRange')
-plt.tight_layout()
-plt.savefig(OUT_IMG, dpi=150)
+# Bar chart for Count (sorted descending) and line for WithinPct
+spec = best_count_spec(df, os.path.splitext(OUT_IMG)[0], 'Best Source Count and %WithinRange', kind='best_counts_simple')
+render(spec)
 print('Wrote chart:', OUT_IMG)
 
 # Print top source details
+plot_df = df.sort_values('Count', ascending=False).reset_index(drop=True)
 if len(plot_df) > 0:
     top = plot_df.iloc[0]
     print('\nTop source by Count:')
@@ -1,106 +1,206 @@
 """Prepare merged dataset: merge each source's predictions with ground-truth NIFTY High/Low.
-Saves `merged_predictions_1year.csv` and `merged_predictions_3year.csv` in workspace.
+Saves `merged_predictions_1year.csv` and `merged_predictions_3year.csv` in workspace,
+plus their compact typed copies (see merged_table.py) for the consumers.
+Every instrument in instruments.py is merged against its own OHLC file into its
+own files (`merged_predictions_<SYMBOL>_1year.csv` for symbols other than NIFTY).
+
+With `--incremental` only source rows newer than each source's high-water date
+are read (from the byte offset reached last time) and appended to the merged
+files. The merged file is compacted (re-sorted, late market data filled in)
+only when an append arrives out of order or NIFTY bars for pending rows land.
 """
+import argparse
+import io
+import json
 import os
-import glob
-import pandas as pd
 from datetime import datetime
 
+from csv_cache import CACHE_DIR, load_csv
+from instruments import PERIODS, merged_name, select, source_files
+from merged_table import COLUMNS, DATE_NA, compact_merged, save_merged
+from ohlc_store import NAT_DAY, OHLCStore, to_day_numbers
+from range_parsing import parse_ranges
+from schema_registry import parse_dates, source_schema
+
 WORKDIR = os.path.dirname(__file__)
-NIFTY_FILE = os.path.join(WORKDIR, 'NIFTY_50-29-11-2024-to-29-11-2025_csv__NIFTY_50-29-11-2024-to-29-11-20.csv')
-
-def load_nifty(path):
-    df = pd.read_csv(path)
-    df.columns = [c.strip() for c in df.columns]
-    date_col = None
-    for c in df.columns:
-        if 'date' in c.lower():
-            date_col = c
-            break
-    if date_col is None:
-        raise RuntimeError('No date-like column found in NIFTY file')
-    df['Date'] = pd.to_datetime(df[date_col], errors='coerce').dt.date
-    # find high/low
-    high_col = None; low_col = None
-    for c in df.columns:
-        if c.lower() == 'high': high_col = c
-        if c.lower() == 'low': low_col = c
-    if high_col is None or low_col is None:
-        for c in df.columns:
-            if 'high' in c.lower(): high_col = c; break
-        for c in df.columns:
-            if 'low' in c.lower(): low_col = c; break
-    df = df.rename(columns={high_col: 'Market_High', low_col: 'Market_Low'})
-    return df[['Date','Market_High','Market_Low']].set_index('Date')
-
-
-def parse_support_resistance_from_row(row):
-    # try common column names
-    for k in ['Support','Support_Level','support','support_level']:
-        if k in row.index and pd.notna(row[k]):
-            try:
-                s = float(str(row[k]).replace(',',''))
-            except:
-                s = None
-            break
-    else:
-        s = None
-    for k in ['Resistance','Resistance_Level','resistance','resistance_level']:
-        if k in row.index and pd.notna(row[k]):
-            try:
-                r = float(str(row[k]).replace(',',''))
-            except:
-                r = None
-            break
-    else:
-        r = None
-    return s, r
-
-
-def process_glob(pattern, out_name):
-    nifty = load_nifty(NIFTY_FILE)
-    files = sorted(glob.glob(os.path.join(WORKDIR, pattern)))
-    rows = []
+
+def prepare_source(df, src, nifty, schema):
+    """Normalize one source's rows and join them to the NIFTY High/Low."""
+    import pandas as pd
+    df['Date'] = parse_dates(df[schema['date']], schema['date_format']).dt.date
+    # support/resistance columns, falling back to a single column like "25800 - 27000"
+    parsed = parse_ranges(df, schema['candidates'])
+    keep = parsed.notna().all(axis=1).to_numpy()
+    s = parsed['Support'].to_numpy()[keep]
+    res = parsed['Resistance'].to_numpy()[keep]
+    dates = df['Date'].to_numpy()[keep]
+    market = nifty.lookup(dates, fields=('High', 'Low'))
+    return pd.DataFrame({'Date': dates, 'Source': src, 'Support': s, 'Resistance': res,
+                         'RangeWidth': res - s, 'RangeMid': (s+res)/2,
+                         'Market_High': market['High'].to_numpy(), 'Market_Low': market['Low'].to_numpy()},
+                        columns=COLUMNS)
+
+
+# --- incremental state ---
+
+def state_path(out_name):
+    return os.path.join(WORKDIR, CACHE_DIR, out_name + '.state.json')
+
+
+def load_state(out_name):
+    try:
+        with open(state_path(out_name), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_state(out_name, state):
+    path = state_path(out_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        return f.readline()
+
+
+def source_entry(path, rows, size):
+    days = to_day_numbers(rows['Date'])
+    days = days[days != NAT_DAY]
+    return {'last_day': int(days.max()) if len(days) else None, 'offset': size,
+            'header': read_header(path).decode('utf-8', errors='replace').strip()}
+
+
+def pending_days(rows):
+    """Days whose rows are still waiting for NIFTY High/Low."""
+    import pandas as pd
+    missing = rows['Market_High'].isna() | rows['Market_Low'].isna()
+    days = rows.loc[missing, 'Date']
+    if pd.api.types.is_integer_dtype(days):
+        return sorted(set(int(d) for d in days if d != DATE_NA))
+    return sorted(set(int(d) for d in to_day_numbers(days) if d != NAT_DAY))
+
+
+def read_new_rows(path, src_state):
+    """Read only the bytes appended to `path` since `src_state['offset']`.
+
+    Falls back to the whole file if it shrank or its header changed.
+    Returns (frame, size).
+    """
+    import pandas as pd
+    size = os.path.getsize(path)
+    header = read_header(path)
+    if (src_state is None or size < src_state['offset']
+            or header.decode('utf-8', errors='replace').strip() != src_state['header']):
+        return load_csv(path), size
+    with open(path, 'rb') as f:
+        f.seek(src_state['offset'])
+        tail = f.read(size - src_state['offset'])
+    return pd.read_csv(io.BytesIO(header + tail)), size
+
+
+def process_period(entry, period, out_name):
+    # never read the merged output back in as a source
+    import pandas as pd
+    files = source_files(entry, period, exclude=[out_name])
+    if not files:
+        print('No source files match', entry['sources'].format(period=period), '- skipping', out_name)
+        return
+    nifty = OHLCStore.open(entry['ohlc'])
+    frames = []
+    state = {'sources': {}}
     for f in files:
         src = os.path.basename(f)
-        df = pd.read_csv(f)
-        df.columns = [c.strip() for c in df.columns]
-        if 'Date' not in df.columns:
-            for c in df.columns:
-                if 'date' in c.lower():
-                    df = df.rename(columns={c:'Date'})
-                    break
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.date
-        for _, r in df.iterrows():
-            s, res = parse_support_resistance_from_row(r)
-            if s is None or res is None:
-                # try parsing a single column like "25800 - 27000"
-                for c in df.columns:
-                    if 'range' in c.lower():
-                        val = str(r[c])
-                        if '-' in val:
-                            parts = val.replace(',', '').split('-')
-                            try:
-                                s = float(parts[0])
-                                res = float(parts[1])
-                            except:
-                                pass
-                        break
-            if s is None or res is None:
-                continue
-            date = r['Date']
-            market_high = None; market_low = None
-            if date in nifty.index:
-                market_high = float(nifty.loc[date, 'Market_High'])
-                market_low = float(nifty.loc[date, 'Market_Low'])
-            rows.append({'Date': date, 'Source': src, 'Support': s, 'Resistance': res,
-                         'RangeWidth': res - s, 'RangeMid': (s+res)/2,
-                         'Market_High': market_high, 'Market_Low': market_low})
-    out = pd.DataFrame(rows)
-    out = out.sort_values('Date')
-    out.to_csv(os.path.join(WORKDIR, out_name), index=False)
+        size = os.path.getsize(f)
+        df = load_csv(f)
+        rows = prepare_source(df, src, nifty, source_schema(f, df))
+        state['sources'][src] = source_entry(f, rows, size)
+        frames.append(rows)
+    out = pd.concat(frames, ignore_index=True)
+    out = compact_merged(out.sort_values('Date'))
+    save_merged(out, os.path.join(WORKDIR, out_name))
+    days = out['Date'][out['Date'] != DATE_NA]
+    state['max_day'] = int(days.max()) if len(days) else None
+    state['pending_days'] = pending_days(out)
+    save_state(out_name, state)
     print('Saved', out_name, 'rows=', len(out))
 
+
+def compact(out_name, nifty, state):
+    """Rewrite the merged file in date order, filling market data that arrived since the append."""
+    out_path = os.path.join(WORKDIR, out_name)
+    df = compact_merged(load_csv(out_path))
+    market = nifty.lookup_days(df['Date'], fields=('High', 'Low'))
+    missing = (df['Market_High'].isna() | df['Market_Low'].isna()).to_numpy()
+    df.loc[missing, 'Market_High'] = market['High'].to_numpy()[missing]
+    df.loc[missing, 'Market_Low'] = market['Low'].to_numpy()[missing]
+    df = df.sort_values('Date', kind='stable')
+    save_merged(df, out_path)
+    state['pending_days'] = pending_days(df)
+    print('Compacted', out_name, 'rows=', len(df))
+
+
+def append_period(entry, period, out_name, force_compact=False):
+    import pandas as pd
+    out_path = os.path.join(WORKDIR, out_name)
+    state = load_state(out_name)
+    if state is None or not os.path.isfile(out_path):
+        print('No incremental state for', out_name, '- running full rebuild')
+        process_period(entry, period, out_name)
+        return
+    nifty = OHLCStore.open(entry['ohlc'])
+    frames = []
+    for f in source_files(entry, period, exclude=[out_name]):
+        src = os.path.basename(f)
+        src_state = state['sources'].get(src)
+        df, size = read_new_rows(f, src_state)
+        rows = prepare_source(df, src, nifty, source_schema(f, df))
+        if src_state is not None and src_state['last_day'] is not None:
+            rows = rows[to_day_numbers(rows['Date']) > src_state['last_day']]
+        new_state = source_entry(f, rows, size)
+        if new_state['last_day'] is None and src_state is not None:
+            new_state['last_day'] = src_state['last_day']
+        state['sources'][src] = new_state
+        frames.append(rows)
+
+    new = pd.concat(frames, ignore_index=True)
+    needs_compact = force_compact
+    if len(new):
+        new = new.sort_values('Date', kind='stable')
+        days = to_day_numbers(new['Date'])
+        days = days[days != NAT_DAY]
+        if len(days) and state.get('max_day') is not None and days.min() < state['max_day']:
+            needs_compact = True
+        if len(days):
+            state['max_day'] = max(int(days.max()), state.get('max_day') or int(days.max()))
+        new.to_csv(out_path, mode='a', header=False, index=False)
+        state['pending_days'] = sorted(set(state.get('pending_days', [])) | set(pending_days(new)))
+    # rows appended before their NIFTY bar existed can be filled now
+    pending = state.get('pending_days', [])
+    if pending and (nifty.day_positions(pending) >= 0).any():
+        needs_compact = True
+    if needs_compact:
+        compact(out_name, nifty, state)
+    save_state(out_name, state)
+    print('Appended', out_name, 'rows=', len(new))
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Merge source predictions with NIFTY High/Low')
+    p.add_argument('--incremental', action='store_true', help='Append only rows newer than the last run')
+    p.add_argument('--compact', action='store_true', help='With --incremental, always re-sort and fill the merged files')
+    p.add_argument('--symbol', action='append', help='Instrument(s) to merge (default: all in instruments.py)')
+    return p.parse_args()
+
+
 if __name__ == '__main__':
-    process_glob('*_1year.csv', 'merged_predictions_1year.csv')
-    process_glob('*_3year.csv', 'merged_predictions_3year.csv')
+    args = parse_args()
+    for symbol, entry in select(args.symbol).items():
+        for period in PERIODS:
+            if args.incremental:
+                append_period(entry, period, merged_name(symbol, period), force_compact=args.compact)
+            else:
+                process_period(entry, period, merged_name(symbol, period))
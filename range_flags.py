@@ -0,0 +1,38 @@
+"""
+Vectorized breach classification of predicted ranges against the actual High/Low.
+Flags are computed with boolean masks and `np.select` into a pandas Categorical,
+and summaries are counted straight from the category codes.
+"""
+import numpy as np
+
+FLAGS = ['WITHIN_RANGE', 'BREACHED_BELOW', 'BREACHED_ABOVE', 'BOTH_BREACH', 'NO_DATA']
+WITHIN_RANGE, BREACHED_BELOW, BREACHED_ABOVE, BOTH_BREACH, NO_DATA = range(len(FLAGS))
+
+
+def classify_ranges(support, resistance, low, high):
+    """Return a Categorical of range flags for aligned support/resistance/low/high arrays.
+
+    NO_DATA wins over everything when any input is missing; a day that breaks
+    both sides is BOTH_BREACH rather than either single-side flag.
+    """
+    import pandas as pd
+    s = np.asarray(support, dtype=float)
+    r = np.asarray(resistance, dtype=float)
+    lo = np.asarray(low, dtype=float)
+    hi = np.asarray(high, dtype=float)
+    missing = np.isnan(s) | np.isnan(r) | np.isnan(lo) | np.isnan(hi)
+    below = lo < s
+    above = hi > r
+    codes = np.select(
+        [missing, below & above, below, above],
+        [NO_DATA, BOTH_BREACH, BREACHED_BELOW, BREACHED_ABOVE],
+        default=WITHIN_RANGE,
+    ).astype(np.int8)
+    return pd.Categorical.from_codes(codes, categories=FLAGS)
+
+
+def flag_counts(flags):
+    """value_counts-style {flag: count} dict, most frequent first, zero counts dropped."""
+    counts = np.bincount(np.asarray(flags.codes), minlength=len(FLAGS))
+    order = np.argsort(-counts, kind='stable')
+    return {FLAGS[i]: int(counts[i]) for i in order if counts[i]}
@@ -0,0 +1,70 @@
+"""
+Shared support/resistance parsing for news-source Nifty CSVs.
+The candidate columns are resolved once per file and every row is parsed in a
+single columnar pass instead of per-row `iterrows` lookups.
+"""
+import numpy as np
+import re
+
+range_re = re.compile(r"(\d+[\.,]?\d*)\s*[-–to]+\s*(\d+[\.,]?\d*)")
+
+RANGE_CANDIDATES = ['nifty_range', 'nifty_range_today', 'nifty_rangetoday']
+
+
+def range_columns(columns):
+    """Return the support/resistance candidates for a file's columns in priority order.
+
+    Each candidate is either a (support_col, resistance_col) pair or a single
+    range column such as `Nifty_Range` holding text like "25800 - 27000".
+    """
+    keys = {c.strip().lower(): c for c in columns}
+    candidates = []
+    if 'support_level' in keys and 'resistance_level' in keys:
+        candidates.append((keys['support_level'], keys['resistance_level']))
+    if 'support' in keys and 'resistance' in keys:
+        candidates.append((keys['support'], keys['resistance']))
+    for cand in RANGE_CANDIDATES:
+        if cand in keys:
+            candidates.append((keys[cand],))
+    # any other column that mentions 'range'
+    for c in columns:
+        if 'range' in c.lower():
+            candidates.append((c,))
+    # drop duplicates, keep priority order
+    return list(dict.fromkeys(candidates))
+
+
+def to_number(col):
+    """Convert a column of numbers (possibly with thousands separators) to float."""
+    import pandas as pd
+    if pd.api.types.is_numeric_dtype(col):
+        return col.astype(float)
+    return pd.to_numeric(col.astype(str).str.replace(',', '', regex=False), errors='coerce')
+
+
+def parse_ranges(df, candidates=None):
+    """Extract Support/Resistance for every row of `df`.
+
+    Returns a DataFrame aligned to `df.index` with float `Support` and
+    `Resistance` columns; rows where no candidate parses are NaN.
+    """
+    import pandas as pd
+    if candidates is None:
+        candidates = range_columns(df.columns)
+    # work on plain arrays so duplicate index labels (e.g. repeated dates) never realign
+    support = np.full(len(df), np.nan)
+    resistance = np.full(len(df), np.nan)
+    for cand in candidates:
+        if len(cand) == 2:
+            s = to_number(df[cand[0]]).to_numpy()
+            r = to_number(df[cand[1]]).to_numpy()
+        else:
+            parts = df[cand[0]].astype(str).str.extract(range_re)
+            s = to_number(parts[0]).to_numpy()
+            r = to_number(parts[1]).to_numpy()
+        fill = np.isnan(support) & ~np.isnan(s) & ~np.isnan(r)
+        support[fill] = s[fill]
+        resistance[fill] = r[fill]
+        if not np.isnan(support).any():
+            break
+    return pd.DataFrame({'Support': support, 'Resistance': resistance}, index=df.index)
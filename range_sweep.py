@@ -0,0 +1,135 @@
+"""
+Parameter sweep over adjustments of the published ranges.
+Every combination of an additive shift, a multiplicative widening (about the
+range mid) and asymmetric low/high offsets is scored against the actual
+High/Low for every source. The rows × combinations grid is evaluated with
+NumPy broadcasting in blocks of combinations and reduced per source with
+`np.add.reduceat`, so no Python loop runs per combination.
+
+    adj_low  = mid - (mid - Pred_Low) * widen + shift - low_offset
+    adj_high = mid + (Pred_High - mid) * widen + shift + high_offset
+
+Grids may start with a negative value (`--shifts -100:100:25`).
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import numpy as np
+
+WORKDIR = os.path.dirname(__file__)
+BLOCK_CELLS = 4_000_000  # rows × combinations evaluated per block (~32 MB per float64 temp)
+GRID_OPTIONS = ('--shifts', '--widen', '--low-offsets', '--high-offsets')
+NEGATIVE_GRID = re.compile(r'^-[\d.]')
+
+
+def parse_grid(text):
+    """'-100:100:25' (inclusive range) or '0,50,100' -> float array"""
+    if ':' in text:
+        start, stop, step = (float(x) for x in text.split(':'))
+        return np.round(np.arange(start, stop + step / 2, step), 10)
+    return np.array([float(x) for x in text.split(',') if x.strip()])
+
+
+def param_grid(shifts=(0,), widenings=(1,), low_offsets=(0,), high_offsets=(0,)):
+    """Cartesian product of the four grids as a DataFrame, one row per combination."""
+    import pandas as pd
+    mesh = np.meshgrid(shifts, widenings, low_offsets, high_offsets, indexing='ij')
+    return pd.DataFrame({name: m.ravel().astype(float) for name, m in
+                         zip(['Shift', 'Widen', 'Low_Offset', 'High_Offset'], mesh)})
+
+
+def sweep(df, params):
+    """Hit rate and mean total error of every (source, combination).
+
+    `df` holds scored backtest rows (Source, Pred_Low, Pred_High, Market_Low,
+    Market_High); `params` comes from `param_grid`. Returns one row per source
+    and combination.
+    """
+    import pandas as pd
+    df = df.sort_values('Source', kind='stable')
+    source = df['Source'].astype(str).to_numpy()
+    starts = np.flatnonzero(np.r_[True, source[1:] != source[:-1]])
+    counts = np.diff(np.r_[starts, len(df)])
+
+    pred_lo = df['Pred_Low'].to_numpy(dtype=float)[:, None]
+    pred_hi = df['Pred_High'].to_numpy(dtype=float)[:, None]
+    mkt_lo = df['Market_Low'].to_numpy(dtype=float)[:, None]
+    mkt_hi = df['Market_High'].to_numpy(dtype=float)[:, None]
+    mid = (pred_lo + pred_hi) / 2
+
+    shift, widen, lo_off, hi_off = (params[c].to_numpy(dtype=float)[None, :]
+                                    for c in ['Shift', 'Widen', 'Low_Offset', 'High_Offset'])
+    n_params = len(params)
+    hits = np.empty((len(starts), n_params))
+    errors = np.empty((len(starts), n_params))
+    block = max(1, BLOCK_CELLS // max(len(df), 1))
+    for b in range(0, n_params, block):
+        sl = slice(b, b + block)
+        adj_lo = mid - (mid - pred_lo) * widen[:, sl] + shift[:, sl] - lo_off[:, sl]
+        adj_hi = mid + (pred_hi - mid) * widen[:, sl] + shift[:, sl] + hi_off[:, sl]
+        hit = (mkt_lo >= adj_lo) & (mkt_hi <= adj_hi)
+        err = np.abs(mkt_hi - adj_hi) + np.abs(adj_lo - mkt_lo)
+        hits[:, sl] = np.add.reduceat(hit, starts, axis=0)
+        errors[:, sl] = np.add.reduceat(err, starts, axis=0)
+
+    n_src = len(starts)
+    out = pd.DataFrame({
+        'Source': np.repeat(source[starts], n_params),
+        'N_Days': np.repeat(counts, n_params),
+    })
+    for c in params.columns:
+        out[c] = np.tile(params[c].to_numpy(), n_src)
+    out['Hit_Rate_%'] = (hits / counts[:, None] * 100).ravel().round(2)
+    out['Avg_Total_Error_pts'] = (errors / counts[:, None]).ravel().round(2)
+    return out
+
+
+def best_per_source(results):
+    """Highest hit rate per source, lowest total error breaking ties."""
+    ranked = results.sort_values(['Source', 'Hit_Rate_%', 'Avg_Total_Error_pts'],
+                                 ascending=[True, False, True], kind='stable')
+    return ranked.groupby('Source', sort=False).head(1).reset_index(drop=True)
+
+
+def attach_grids(argv):
+    """`--shifts -100:100:25` -> `--shifts=-100:100:25`, so argparse does not read a negative grid as an option."""
+    out = []
+    i = 0
+    while i < len(argv):
+        if argv[i] in GRID_OPTIONS and i + 1 < len(argv) and NEGATIVE_GRID.match(argv[i + 1]):
+            out.append(f'{argv[i]}={argv[i + 1]}')
+            i += 2
+        else:
+            out.append(argv[i])
+            i += 1
+    return out
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Sweep range shifts/widenings against the backtest detail')
+    p.add_argument('--prefix', default='1year', help='Backtest prefix (reads <prefix>_backtest_detail.csv)')
+    p.add_argument('--shifts', type=parse_grid, default=parse_grid('-500:500:25'), help='Additive shifts, start:stop:step or a,b,c (e.g. -100:100:25)')
+    p.add_argument('--widen', type=parse_grid, default=parse_grid('1:3:0.1'), help='Multiplicative widening about the mid')
+    p.add_argument('--low-offsets', type=parse_grid, default=parse_grid('0:500:50'), help='Extra points below the low')
+    p.add_argument('--high-offsets', type=parse_grid, default=parse_grid('0:500:50'), help='Extra points above the high')
+    return p.parse_args(attach_grids(sys.argv[1:] if argv is None else argv))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    import pandas as pd
+    detail_file = os.path.join(WORKDIR, f'{args.prefix}_backtest_detail.csv')
+    detail = pd.read_csv(detail_file, usecols=['Source', 'Pred_Low', 'Pred_High', 'Market_Low', 'Market_High'])
+    params = param_grid(args.shifts, args.widen, args.low_offsets, args.high_offsets)
+    t0 = time.perf_counter()
+    results = sweep(detail, params)
+    elapsed = time.perf_counter() - t0
+    out_file = os.path.join(WORKDIR, f'{args.prefix}_range_sweep.csv')
+    results.to_csv(out_file, index=False)
+    print(f'Swept {len(params)} combinations x {results["Source"].nunique()} sources '
+          f'over {len(detail)} rows in {elapsed:.2f}s')
+    print(f'✅ Saved sweep: {os.path.basename(out_file)}')
+    print('\n🏆 BEST ADJUSTMENT PER SOURCE:')
+    print(best_per_source(results).to_string(index=False))
@@ -0,0 +1,134 @@
+"""
+Content-addressed cache for backtest results.
+An entry is keyed on the SHA-256 of its input files (the merged predictions
+and the code that scores them) plus the run parameters, and holds its frames
+as Parquet under `.cache/results/<key>/`. A run with the same inputs is a hit
+no matter when or under which prefix it was computed.
+
+Each output prefix also records the key of its latest run, so downstream
+stages (report, charts) can ask for `load_results(prefix)` and get the frames
+without re-reading the CSVs; they fall back to the CSVs on a miss.
+"""
+import hashlib
+import json
+import os
+
+from csv_cache import CACHE_DIR, file_hash
+
+WORKDIR = os.path.dirname(__file__)
+RESULTS_DIR = os.path.join(WORKDIR, CACHE_DIR, 'results')
+HASHES_FILE = os.path.join(RESULTS_DIR, 'hashes.json')
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def content_hashes(paths):
+    """{path: sha256} of `paths`; a file is only re-hashed when its mtime/size changed."""
+    known = _read_json(HASHES_FILE) or {}
+    out = {}
+    changed = False
+    for path in paths:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        entry = known.get(path)
+        if not entry or entry['mtime_ns'] != st.st_mtime_ns or entry['size'] != st.st_size:
+            entry = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': file_hash(path)}
+            known[path] = entry
+            changed = True
+        out[path] = entry['sha256']
+    if changed:
+        try:
+            _write_json(HASHES_FILE, known)
+        except OSError:
+            pass
+    return out
+
+
+def cache_key(inputs, params=None):
+    """Key of a run over the `inputs` files with `params` (a JSON-serialisable dict)."""
+    hashes = content_hashes(inputs)
+    h = hashlib.sha256()
+    # inputs are identified by content and role (position), not by path
+    h.update(json.dumps({'inputs': [hashes[os.path.abspath(p)] for p in inputs],
+                         'params': params or {}}, sort_keys=True).encode())
+    return h.hexdigest()[:32]
+
+
+def _entry_dir(key):
+    return os.path.join(RESULTS_DIR, key)
+
+
+def get(key):
+    """Frames stored under `key` as {name: DataFrame}, or None on a miss."""
+    import pandas as pd
+    meta = _read_json(os.path.join(_entry_dir(key), 'meta.json'))
+    if meta is None:
+        return None
+    try:
+        return {name: pd.read_parquet(os.path.join(_entry_dir(key), f'{name}.parquet'))
+                for name in meta['frames']}
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+def put(key, frames, inputs=(), params=None):
+    """Store {name: DataFrame} under `key`; returns False if they could not be written."""
+    folder = _entry_dir(key)
+    try:
+        os.makedirs(folder, exist_ok=True)
+        for name, frame in frames.items():
+            tmp_path = os.path.join(folder, f'{name}.parquet.{os.getpid()}.tmp')
+            frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, os.path.join(folder, f'{name}.parquet'))
+        # meta.json last: an entry without it is never served
+        _write_json(os.path.join(folder, 'meta.json'), {
+            'frames': list(frames), 'inputs': [os.path.abspath(p) for p in inputs], 'params': params or {}})
+    except (ImportError, OSError, TypeError, ValueError):
+        # no parquet engine or a column pyarrow can't type; run uncached
+        return False
+    return True
+
+
+def _label_path(label):
+    return os.path.join(RESULTS_DIR, f'{label}.json')
+
+
+def link(label, key):
+    """Record `key` as the latest run for the output prefix `label` (None clears it)."""
+    try:
+        _write_json(_label_path(label), {'key': key})
+    except OSError:
+        pass
+
+
+def linked_key(label):
+    entry = _read_json(_label_path(label))
+    return entry['key'] if entry else None
+
+
+def load_results(label):
+    """Frames of the latest run for `label`, or None if there is none or its inputs changed since."""
+    key = linked_key(label)
+    meta = _read_json(os.path.join(_entry_dir(key), 'meta.json')) if key else None
+    if meta is None:
+        return None
+    try:
+        if cache_key(meta['inputs'], meta['params']) != key:
+            return None
+    except OSError:
+        return None
+    return get(key)
@@ -0,0 +1,62 @@
+"""
+Trailing-window backtest metrics per source.
+Each metric is a running sum over the rows of one source in date order, so a
+window of w trading days ending at row i is `C[i] - C[i - w]` on the cumulative
+sums: one pass over the rows per window, whatever the window length.
+"""
+import numpy as np
+
+DEFAULT_WINDOWS = (20, 60, 250)
+
+# metric name -> (scored column, scale); each metric is the window mean of the column times scale
+RATE_COLUMNS = {
+    'Hit_Rate_%': ('Full_Hit', 100),
+    'High_Miss_%': ('High_Miss', 100),
+    'Low_Miss_%': ('Low_Miss', 100),
+    'Avg_Abs_High_Error_pts': ('Abs_High_Error', 1),
+    'Avg_Abs_Low_Error_pts': ('Abs_Low_Error', 1),
+}
+
+
+def parse_windows(text):
+    """'20,60,250' -> (20, 60, 250)"""
+    windows = tuple(int(w) for w in text.split(',') if w.strip())
+    if not windows or min(windows) < 1:
+        raise ValueError(f'Bad window list: {text!r}')
+    return windows
+
+
+def rolling_metrics(df, windows=DEFAULT_WINDOWS):
+    """Per-source trailing metrics for every scored row (see `score_predictions`).
+
+    Returns Date, Source and one column per metric and window, e.g. `Hit_Rate_%_20d`.
+    A window is NaN until the source has that many rows.
+    """
+    import pandas as pd
+    df = df.sort_values(['Source', 'Date'], kind='stable')
+    source = df['Source'].to_numpy()
+    # bias = mean(High_Error) - mean(Low_Error), so one running sum of the difference
+    values = np.column_stack(
+        [df[col].to_numpy(dtype=float) for col, _ in RATE_COLUMNS.values()]
+        + [(df['High_Error'] - df['Low_Error']).to_numpy(dtype=float)])
+    csum = np.zeros((len(df) + 1, values.shape[1]))
+    np.cumsum(values, axis=0, out=csum[1:])
+
+    # position of each row within its source (rows are grouped by source above)
+    starts = np.ones(len(df), dtype=bool)
+    starts[1:] = source[1:] != source[:-1]
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(df)), 0))
+    pos = np.arange(len(df)) - first
+
+    out = {'Date': df['Date'].to_numpy(), 'Source': source}
+    names = list(RATE_COLUMNS) + ['Directional_Bias']
+    scales = np.array([scale for _, scale in RATE_COLUMNS.values()] + [1])
+    end = np.arange(1, len(df) + 1)
+    for w in windows:
+        full = pos + 1 >= w
+        means = (csum[end] - csum[np.where(full, end - w, 0)]) / w * scales
+        means[~full] = np.nan
+        for j, name in enumerate(names):
+            out[f'{name}_{w}d'] = means[:, j].round(2)
+    result = pd.DataFrame(out)
+    return result.sort_values(['Date', 'Source'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,141 @@
+"""
+Persistent schema registry for the heterogeneous input files.
+Column roles (date, support/resistance pair, range text, OHLC fields) and the
+date format are inferred once per file and recorded in
+`.cache/schema_registry/<file name>.json` next to it. Loaders ask the
+registry instead of re-running the name heuristics on every run; an entry is
+re-inferred only when the file's header changes. Rows whose dates do not
+match the registered format are still parsed (see `parse_dates`).
+"""
+import json
+import os
+
+from csv_cache import CACHE_DIR
+from range_parsing import range_columns
+
+REGISTRY_DIR = 'schema_registry'
+DATE_FORMATS = ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%m/%d/%Y', '%Y/%m/%d', '%d-%b-%Y', '%d %b %Y', '%d-%b-%y']
+OHLC_FIELDS = ('Open', 'High', 'Low', 'Close')
+
+# registry entries per entry file, loaded once per process
+_entries = {}
+
+
+def find_column(columns, name):
+    """Exact case-insensitive match first, then the first column containing `name`."""
+    for c in columns:
+        if c.strip().lower() == name:
+            return c
+    for c in columns:
+        if name in c.strip().lower():
+            return c
+    return None
+
+
+def infer_date_format(values):
+    """Return the first known format that parses every value, or None.
+
+    Formats are tried on a sample first and confirmed on the distinct values
+    of the whole column.
+    """
+    import pandas as pd
+    values = pd.Series(values).dropna()
+    if values.empty:
+        return None
+    sample, distinct = values.head(50), pd.Series(values.unique())
+    for fmt in DATE_FORMATS:
+        if (pd.to_datetime(sample, format=fmt, errors='coerce').notna().all()
+                and pd.to_datetime(distinct, format=fmt, errors='coerce').notna().all()):
+            return fmt
+    return None
+
+
+def parse_dates(values, fmt=None):
+    """Parse a date column with the registered format.
+
+    Values the format does not match (e.g. rows appended later in another
+    layout) are parsed free-form, so they are only NaT if that fails too.
+    """
+    import pandas as pd
+    if fmt is None:
+        return pd.to_datetime(values, errors='coerce')
+    parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+    missed = parsed.isna() & values.notna()
+    if missed.any():
+        # element-wise, so each leftover value gets its own layout
+        rest = values[missed]
+        lookup = {v: pd.to_datetime(v, errors='coerce') for v in rest.unique()}
+        parsed[missed] = pd.to_datetime(rest.map(lookup))
+    return parsed
+
+
+def infer_source_schema(df):
+    date_col = find_column(df.columns, 'date')
+    candidates = range_columns(df.columns)
+    return {
+        'kind': 'source',
+        'date': date_col,
+        'date_format': infer_date_format(df[date_col]) if date_col is not None else None,
+        'candidates': [list(c) for c in candidates],
+        'formats': {c[0]: 'number' if len(c) == 2 else 'range_text' for c in candidates},
+    }
+
+
+def infer_ohlc_schema(df):
+    date_col = find_column(df.columns, 'date')
+    return {
+        'kind': 'ohlc',
+        'date': date_col,
+        'date_format': infer_date_format(df[date_col]) if date_col is not None else None,
+        'fields': {f: find_column(df.columns, f.lower()) for f in OHLC_FIELDS},
+    }
+
+
+def entry_path(path):
+    """One registry entry file per input file, so concurrent workers never rewrite each other's entries."""
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR, REGISTRY_DIR,
+                        f'{os.path.basename(path)}.json')
+
+
+def _load_entry(entry_path):
+    if entry_path not in _entries:
+        try:
+            with open(entry_path, encoding='utf-8') as f:
+                _entries[entry_path] = json.load(f)
+        except (OSError, ValueError):
+            _entries[entry_path] = None
+    return _entries[entry_path]
+
+
+def _save_entry(entry_path, entry):
+    _entries[entry_path] = entry
+    try:
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp_path, entry_path)
+    except OSError:
+        pass
+
+
+def _resolve(path, df, kind, infer):
+    reg_path = entry_path(path)
+    columns = [str(c) for c in df.columns]
+    entry = _load_entry(reg_path)
+    if entry is None or entry.get('kind') != kind or entry.get('columns') != columns:
+        entry = infer(df)
+        entry['columns'] = columns
+        _save_entry(reg_path, entry)
+    return entry
+
+
+def source_schema(path, df):
+    """Column roles of a news-source file: date, date format and range candidates."""
+    schema = _resolve(path, df, 'source', infer_source_schema)
+    return dict(schema, candidates=[tuple(c) for c in schema['candidates']])
+
+
+def ohlc_schema(path, df):
+    """Column roles of an OHLC history file: date, date format and Open/High/Low/Close."""
+    return _resolve(path, df, 'ohlc', infer_ohlc_schema)
@@ -0,0 +1,63 @@
+"""
+Date x source matrices of the backtest detail rows.
+`source_matrix` sorts the detail rows once, takes the running hit count of
+every source in a single grouped cumsum and unstacks everything into one wide
+frame: a Date index and (metric, source) columns. Dashboards, reports and
+monitoring slice it (`matrix['Cumulative_Hits']`, `source_frame(matrix, src)`)
+instead of filtering the full table per source. Cells a source did not
+publish are NaN.
+
+A source with several rows on one date gets one cell per metric: hit counts
+are summed, errors averaged, the running totals taken after its last row
+that day, and `Rows` counts the rows, so `row_mean` and `Rows.sum()` still
+agree with the per-row summary (N_Days).
+
+The result cache stores the matrix next to the detail and summary frames.
+"""
+
+# per-day values kept in the matrix, and the running totals built from them
+VALUES = ['Full_Hit', 'High_Error', 'Low_Error', 'Total_Error']
+CUMULATIVE = {'Full_Hit': 'Cumulative_Hits'}
+SEP = '|'
+
+
+def source_matrix(detail_df, values=VALUES, cumulative=CUMULATIVE):
+    """Date x (metric, source) matrix of `values`, the `cumulative` running totals and `Rows`."""
+    df = detail_df[['Date', 'Source'] + list(values)].sort_values('Date', kind='stable')
+    df = df.astype({'Source': str, **{c: float for c in values}})
+    running = df[list(cumulative)].groupby(df['Source'], sort=False).cumsum()
+    df = df.assign(**{name: running[col] for col, name in cumulative.items()}, Rows=1)
+    if df.duplicated(['Date', 'Source']).any():
+        how = {c: 'sum' if c in cumulative else 'mean' for c in values}
+        how.update({name: 'last' for name in cumulative.values()}, Rows='sum')
+        df = df.groupby(['Date', 'Source'], sort=False, as_index=False).agg(how)
+    matrix = df.set_index(['Date', 'Source']).unstack('Source')
+    return matrix.rename_axis(columns=['Metric', 'Source'])
+
+
+def source_frame(matrix, source):
+    """One source's rows (the days it published) as a Date x metric frame."""
+    frame = matrix.xs(source, axis=1, level='Source')
+    return frame[frame['Rows'].notna()]
+
+
+def row_mean(frame, metric):
+    """Per-row mean of `metric` over a source's days, weighting each day by its `Rows`."""
+    weights = frame['Rows'].where(frame[metric].notna())
+    return (frame[metric] * weights).sum() / weights.sum()
+
+
+def to_frame(matrix):
+    """Flat, Parquet-friendly layout of a matrix: a Date column plus `metric|source` columns."""
+    flat = matrix.copy()
+    flat.columns = [f'{metric}{SEP}{source}' for metric, source in matrix.columns]
+    return flat.reset_index()
+
+
+def from_frame(flat):
+    """Inverse of `to_frame`."""
+    import pandas as pd
+    matrix = flat.set_index('Date')
+    matrix.columns = pd.MultiIndex.from_tuples([tuple(c.split(SEP, 1)) for c in matrix.columns],
+                                               names=['Metric', 'Source'])
+    return matrix
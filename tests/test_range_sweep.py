@@ -0,0 +1,16 @@
+import numpy as np
+
+from range_sweep import parse_args, parse_grid
+
+
+def test_negative_grid_without_equals():
+    args = parse_args(['--shifts', '-100:100:50', '--low-offsets', '-50,0,50', '--widen', '1'])
+    assert np.array_equal(args.shifts, [-100, -50, 0, 50, 100])
+    assert np.array_equal(args.low_offsets, [-50, 0, 50])
+    assert np.array_equal(args.widen, [1])
+
+
+def test_equals_form_still_parses():
+    args = parse_args(['--shifts=-100:100:50', '--high-offsets', '0:100:50'])
+    assert np.array_equal(args.shifts, parse_grid('-100:100:50'))
+    assert np.array_equal(args.high_offsets, [0, 50, 100])
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from walk_forward import DEFAULT_GRIDS, best_run, grid_search, score_ranges
+
+
+def synthetic_period(n_days=120, n_sources=4, seed=0):
+    rng = np.random.default_rng(seed)
+    mid = 20000 + np.cumsum(rng.normal(0, 80, n_days))
+    market_low, market_high = mid - rng.uniform(50, 150, n_days), mid + rng.uniform(50, 150, n_days)
+    support = mid[:, None] - rng.uniform(0, 300, (n_days, n_sources))
+    resistance = mid[:, None] + rng.uniform(0, 300, (n_days, n_sources))
+    # sources skip some days
+    skipped = rng.random((n_days, n_sources)) < 0.1
+    support[skipped] = resistance[skipped] = np.nan
+    distance = np.abs(support - market_low[:, None]) + np.abs(resistance - market_high[:, None])
+    return {'days': np.arange(n_days), 'sources': [f'src{i}' for i in range(n_sources)],
+            'support': support, 'resistance': resistance,
+            'market_high': market_high, 'market_low': market_low, 'distance': distance}
+
+
+@pytest.mark.parametrize('rule', sorted(DEFAULT_GRIDS))
+def test_best_run_reproduces_its_grid_row(rule):
+    data = synthetic_period()
+    # mixed rules make the Param column float, window lengths included
+    results = grid_search(data, dict(DEFAULT_GRIDS))
+    assert results['Param'].dtype == float
+    top, s, r, _ = best_run(data, results[results['Rule'] == rule])
+    n, hit_rate, mean_dist = score_ranges(s, r, data['market_high'][None], data['market_low'][None])
+    assert top['Rule'] == rule
+    assert n[0] == top['Days_Traded']
+    assert np.round(hit_rate[0], 2) == top['Hit_Rate_%']
+    assert np.round(mean_dist[0], 2) == top['Avg_Distance']
@@ -0,0 +1,191 @@
+"""
+Trade P&L simulator for the Entry/Target/Stop setups published by each source.
+Each BUY/SELL setup is resolved against that day's bar of its instrument (the
+file's symbol, or the `Asset` column of multi-asset files such as the premarket
+trade setups, matched through the aliases in instruments.py):
+  - filled when the bar trades through Entry_Price (or always, with --fill assume)
+  - TARGET / STOP when only that level was reached
+  - BOTH when the bar reached both; the tie rule decides which came first
+    ('stop' is the conservative default, 'target', or 'open': the level
+    nearer the open is taken to trade first)
+  - CLOSE when neither was reached: exit at the close
+Exits are at the level price. Everything is array arithmetic over the full
+table; equity curves and drawdowns use grouped cumulative sums.
+"""
+import argparse
+import os
+import numpy as np
+
+from csv_cache import load_csv
+from instruments import DEFAULT_SYMBOL, asset_symbols, normalize_asset, select, source_files, symbol_prefix
+from ohlc_store import NAT_DAY, OHLCStore, from_day_numbers, to_day_numbers
+from schema_registry import find_column, source_schema
+
+WORKDIR = os.path.dirname(__file__)
+
+OUTCOMES = ['NO_DATA', 'NO_FILL', 'TARGET', 'STOP', 'BOTH_TARGET', 'BOTH_STOP', 'CLOSE']
+TIE_RULES = ('stop', 'target', 'open')
+
+
+def load_setups(files, symbol=DEFAULT_SYMBOL, assets=None):
+    """Date, Source, Symbol, Action and Entry/Target/Stop of every BUY/SELL row in `files`.
+
+    Rows of files with an Asset column get the symbol their asset maps to in
+    `assets` (None when unknown); other rows get `symbol`.
+    """
+    import pandas as pd
+    frames = []
+    for f in files:
+        df = load_csv(f)
+        schema = source_schema(f, df)
+        cols = {name: find_column(df.columns, key) for name, key in
+                [('Action', 'action'), ('Entry', 'entry'), ('Target', 'target_price'), ('Stop', 'stop')]}
+        if schema['date'] is None or None in cols.values():
+            print('Skipping', os.path.basename(f), 'no Action/Entry/Target/Stop columns')
+            continue
+        asset_col = find_column(df.columns, 'asset')
+        if asset_col is not None:
+            names = df[asset_col].map(normalize_asset)
+            symbols = names.map(assets or {}).astype(object).where(names.isin(list(assets or {})), None)
+        else:
+            symbols = symbol
+        frames.append(pd.DataFrame({
+            'Day': to_day_numbers(df[schema['date']], schema['date_format']),
+            'Source': os.path.basename(f),
+            'Symbol': symbols,
+            'Action': df[cols['Action']].astype(str).str.strip().str.upper(),
+            'Entry': pd.to_numeric(df[cols['Entry']], errors='coerce'),
+            'Target': pd.to_numeric(df[cols['Target']], errors='coerce'),
+            'Stop': pd.to_numeric(df[cols['Stop']], errors='coerce'),
+        }))
+    setups = pd.concat(frames, ignore_index=True)
+    keep = (setups['Day'] != NAT_DAY) & setups['Action'].isin(['BUY', 'SELL'])
+    return setups[keep & setups[['Entry', 'Target', 'Stop']].notna().all(axis=1)].reset_index(drop=True)
+
+
+def symbol_bars(setups, stores):
+    """Open/High/Low/Close arrays aligned to `setups`, each row from its own symbol's store."""
+    bars = np.full((len(setups), 4), np.nan)
+    for symbol, rows in setups.groupby('Symbol').indices.items():
+        if symbol in stores:
+            bars[rows] = stores[symbol].lookup_days(setups['Day'].to_numpy()[rows]).to_numpy()
+    return bars.T
+
+
+def simulate(setups, stores, tie='stop', fill='touch'):
+    """Resolve every setup against its day's bar; returns the setups with Outcome, Exit and P&L.
+
+    `stores` maps symbols to their OHLCStore; setups of other symbols are NO_DATA.
+    """
+    import pandas as pd
+    if tie not in TIE_RULES:
+        raise ValueError(f'Unknown tie rule {tie!r}')
+    o, h, l, c = symbol_bars(setups, stores)
+    entry, target, stop = (setups[f].to_numpy(dtype=float) for f in ('Entry', 'Target', 'Stop'))
+    side = np.where(setups['Action'].to_numpy() == 'BUY', 1.0, -1.0)
+
+    has_bar = ~np.isnan(h) & ~np.isnan(l)
+    filled = has_bar & ((l <= entry) & (entry <= h) if fill == 'touch' else True)
+    # a long reaches its target on the high and its stop on the low; a short the reverse
+    target_hit = np.where(side > 0, h >= target, l <= target)
+    stop_hit = np.where(side > 0, l <= stop, h >= stop)
+    both = target_hit & stop_hit
+    if tie == 'stop':
+        target_first = np.zeros(len(setups), dtype=bool)
+    elif tie == 'target':
+        target_first = np.ones(len(setups), dtype=bool)
+    else:
+        target_first = np.abs(target - o) < np.abs(stop - o)
+
+    codes = np.select(
+        [~has_bar, ~filled, both & target_first, both, target_hit, stop_hit],
+        [0, 1, 4, 5, 2, 3], default=6)
+    exit_price = np.select([codes == 2, codes == 4, codes == 3, codes == 5, codes == 6],
+                           [target, target, stop, stop, c], default=np.nan)
+    pnl = (exit_price - entry) * side
+    risk = np.abs(entry - stop)
+    out = setups.drop(columns='Day')
+    out.insert(0, 'Date', from_day_numbers(setups['Day'].to_numpy()))
+    return out.assign(
+        Outcome=pd.Categorical.from_codes(codes, categories=OUTCOMES),
+        Exit=exit_price,
+        PnL_pts=pnl,
+        R_Multiple=np.where(risk > 0, pnl / np.where(risk > 0, risk, 1), np.nan),
+    )
+
+
+# equity curves and summaries are kept per (symbol, source)
+KEYS = ['Symbol', 'Source']
+
+
+def equity_curves(trades):
+    """Per-symbol, per-source cumulative P&L and drawdown over filled trades, in date order."""
+    import pandas as pd
+    done = trades[trades['PnL_pts'].notna()].sort_values(KEYS + ['Date'], kind='stable')
+    keys = [done[k] for k in KEYS]
+    equity = done['PnL_pts'].groupby(keys, sort=False).cumsum()
+    peak = equity.groupby(keys, sort=False).cummax().clip(lower=0)
+    return pd.DataFrame({'Date': done['Date'], 'Symbol': done['Symbol'], 'Source': done['Source'],
+                         'PnL_pts': done['PnL_pts'], 'Equity_pts': equity,
+                         'Drawdown_pts': equity - peak}).reset_index(drop=True)
+
+
+def trade_summary(trades, curves):
+    """Win rate, expectancy, total P&L and max drawdown per symbol and source."""
+    import pandas as pd
+    trades = trades.assign(Symbol=trades['Symbol'].fillna('UNKNOWN'))
+    done = trades[trades['PnL_pts'].notna()]
+    done = done.assign(Win=done['PnL_pts'] > 0)
+    g = done.groupby(KEYS)
+    summary = pd.DataFrame({
+        'Setups': trades.groupby(KEYS).size(),
+        'Trades': g.size(),
+        'Win_Rate_%': (g['Win'].mean() * 100).round(2),
+        'Expectancy_pts': g['PnL_pts'].mean().round(2),
+        'Expectancy_R': g['R_Multiple'].mean().round(3),
+        'Total_PnL_pts': g['PnL_pts'].sum().round(2),
+        'Max_Drawdown_pts': curves.groupby(KEYS)['Drawdown_pts'].min().round(2),
+    })
+    counts = pd.crosstab([trades[k] for k in KEYS], trades['Outcome']).reindex(columns=OUTCOMES, fill_value=0)
+    summary = summary.join(counts.add_suffix('_n'))
+    summary[['Trades']] = summary[['Trades']].fillna(0).astype(int)
+    return summary.reset_index().sort_values('Total_PnL_pts', ascending=False)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Simulate the Entry/Target/Stop setups against daily instrument bars')
+    p.add_argument('--prefix', default='1year', help="Period of the source files ('1year' or '3year')")
+    p.add_argument('--symbol', action='append', help='Instrument(s) to simulate (default: all in instruments.py)')
+    p.add_argument('--setups', action='append', default=[],
+                   help='Extra setup files, e.g. multi-asset files with an Asset column')
+    p.add_argument('--tie', choices=TIE_RULES, default='stop',
+                   help='Which level trades first when the bar reaches both')
+    p.add_argument('--fill', choices=('touch', 'assume'), default='touch',
+                   help="'touch': only trade when the bar reached Entry_Price; 'assume': always fill at entry")
+    return p.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    import pandas as pd
+    instruments = select(args.symbol)
+    stores = {symbol: OHLCStore.open(entry['ohlc']) for symbol, entry in instruments.items()
+              if os.path.isfile(entry['ohlc'])}
+    frames = [load_setups(files, symbol) for symbol, files in
+              ((symbol, source_files(entry, args.prefix)) for symbol, entry in instruments.items()) if files]
+    if args.setups:
+        frames.append(load_setups([os.path.join(WORKDIR, f) for f in args.setups], assets=asset_symbols(instruments)))
+    if not frames:
+        raise SystemExit(f'No setup files for {", ".join(instruments)} ({args.prefix})')
+    trades = simulate(pd.concat(frames, ignore_index=True), stores, tie=args.tie, fill=args.fill)
+    curves = equity_curves(trades)
+    summary = trade_summary(trades, curves)
+
+    # one symbol keeps that symbol's prefix; a mixed run is written under the period alone
+    out_prefix = symbol_prefix(next(iter(instruments)), args.prefix) if len(instruments) == 1 and not args.setups else args.prefix
+    outputs = {'trades': trades, 'trade_equity': curves, 'trade_summary': summary}
+    for name, frame in outputs.items():
+        frame.to_csv(os.path.join(WORKDIR, f'{out_prefix}_{name}.csv'), index=False)
+    print(f'\n💰 TRADE SIMULATION ({out_prefix}, tie={args.tie}, fill={args.fill}):')
+    print(summary.to_string(index=False))
+    print(f"\n✅ Saved: {', '.join(f'{out_prefix}_{n}.csv' for n in outputs)}")
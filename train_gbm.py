@@ -9,11 +9,13 @@ import lightgbm as lgb
 from sklearn.metrics import mean_squared_error, accuracy_score, precision_score, recall_score, f1_score
 import joblib
 
+from merged_table import expand_dates, load_merged
+
 WORKDIR = os.path.dirname(__file__)
 INFILE = os.path.join(WORKDIR, 'merged_predictions_1year.csv')
 
 print('Loading', INFILE)
-df = pd.read_csv(INFILE, parse_dates=['Date'])
+df = load_merged(INFILE)
 df = df.sort_values('Date')
 # create targets
 # drop rows with missing market values
@@ -24,7 +26,7 @@ df['WithinLow'] = (df['Market_Low'] >= df['Support']).astype(int)
 df['WithinRange'] = ((df['WithinHigh'] == 1) & (df['WithinLow'] == 1)).astype(int)
 
 # basic features
-df['DayOfWeek'] = df['Date'].dt.dayofweek
+df['DayOfWeek'] = expand_dates(df['Date']).dt.dayofweek
 # source encoding
 src_dummies = pd.get_dummies(df['Source'], prefix='src')
 X_num = df[['Support','Resistance','RangeWidth','RangeMid','DayOfWeek']]
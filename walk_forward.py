@@ -0,0 +1,226 @@
+"""
+Walk-forward source selection.
+`merge_and_select_best.py` picks each day's best source with hindsight (it
+uses that day's High/Low). Here the range used each morning is chosen only
+from what was known by the previous close:
+  - window: the source with the lowest mean distance over the last N trading days
+  - ewm:    the source with the lowest exponentially weighted distance (decay alpha)
+  - hedge:  a blend of all sources weighted by exp(-eta * cumulative distance)
+            (multiplicative weights, the full-information bandit rule)
+Every rule is a single pass over the date x source distance matrix and is
+vectorized over its parameter grid, so grid searches stay cheap.
+"""
+import argparse
+import os
+import time
+import numpy as np
+
+from instruments import DEFAULT_SYMBOL, select, source_files, symbol_prefix
+from merge_and_select_best import range_distances
+from ohlc_store import OHLCStore, from_day_numbers
+
+WORKDIR = os.path.dirname(__file__)
+
+DEFAULT_GRIDS = {
+    'window': [1, 3, 5, 10, 20, 40, 60],
+    'ewm': [0.02, 0.05, 0.1, 0.2, 0.3, 0.5],
+    'hedge': [1e-5, 3e-5, 1e-4, 3e-4, 1e-3, 3e-3],
+}
+
+
+def window_scores(distance, windows):
+    """Mean distance of each source over the previous `w` days, for every w: P x D x S.
+
+    NaN where the source has no distance in the window (or on day 0).
+    """
+    observed = ~np.isnan(distance)
+    csum = np.zeros((len(distance) + 1, distance.shape[1]))
+    count = np.zeros_like(csum)
+    np.cumsum(np.where(observed, distance, 0), axis=0, out=csum[1:])
+    np.cumsum(observed, axis=0, out=count[1:])
+    t = np.arange(len(distance))
+    out = np.empty((len(windows),) + distance.shape)
+    for i, w in enumerate(windows):
+        # days t-w .. t-1: everything known on the morning of day t
+        lo = np.maximum(t - int(w), 0)
+        n = count[t] - count[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[i] = np.where(n > 0, (csum[t] - csum[lo]) / n, np.nan)
+    return out
+
+
+def ewm_scores(distance, alphas):
+    """Exponentially weighted distance of each source as of each morning: P x D x S."""
+    alphas = np.asarray(alphas, dtype=float)[:, None]
+    state = np.full((len(alphas), distance.shape[1]), np.nan)
+    out = np.empty((len(alphas),) + distance.shape)
+    for t in range(len(distance)):
+        out[:, t] = state
+        d = distance[t][None, :]
+        seen = ~np.isnan(d)
+        state = np.where(seen, np.where(np.isnan(state), d, (1 - alphas) * state + alphas * d), state)
+    return out
+
+
+def hedge_weights(distance, etas):
+    """Multiplicative weights from the cumulative distance up to the previous day: P x D x S.
+
+    Days a source did not publish count as that day's mean distance.
+    """
+    day_mean = np.nanmean(np.where(np.isnan(distance).all(axis=1)[:, None], 0, distance), axis=1)
+    loss = np.where(np.isnan(distance), day_mean[:, None], distance)
+    cum = np.zeros_like(loss)
+    np.cumsum(loss[:-1], axis=0, out=cum[1:])
+    cum -= cum.min(axis=1, keepdims=True)
+    w = np.exp(-np.asarray(etas, dtype=float)[:, None, None] * cum[None])
+    return w
+
+
+def choose(scores, available):
+    """Index of the lowest-scoring available source per parameter and day; -1 if none."""
+    s = np.where(available[None] & ~np.isnan(scores), scores, np.inf)
+    idx = s.argmin(axis=2)
+    return np.where(np.isfinite(s.min(axis=2)), idx, -1)
+
+
+def selected_ranges(choice, support, resistance):
+    """Support/resistance of the chosen sources: two P x D arrays, NaN where nothing was chosen."""
+    rows = np.arange(support.shape[0])[None, :]
+    safe = np.maximum(choice, 0)
+    return (np.where(choice >= 0, support[rows, safe], np.nan),
+            np.where(choice >= 0, resistance[rows, safe], np.nan))
+
+
+def blended_ranges(weights, support, resistance, available):
+    """Weight-averaged support/resistance over the sources available each day: two P x D arrays."""
+    w = np.where(available[None], weights, 0)
+    total = w.sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s = (w * np.nan_to_num(support)[None]).sum(axis=2) / total
+        r = (w * np.nan_to_num(resistance)[None]).sum(axis=2) / total
+    return np.where(total > 0, s, np.nan), np.where(total > 0, r, np.nan)
+
+
+def score_ranges(s, r, market_high, market_low):
+    """Days traded, hit rate and mean distance per parameter for P x D ranges."""
+    traded = ~np.isnan(s) & ~np.isnan(r)
+    hit = traded & (market_low >= s) & (market_high <= r)
+    dist = np.abs(s - market_low) + np.abs(r - market_high)
+    n = traded.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return n, hit.sum(axis=1) / n * 100, np.where(traded, dist, 0).sum(axis=1) / n
+
+
+def walk_forward(data, rule, params):
+    """Ranges each rule would have used every morning: (s, r, choice) with P x D arrays.
+
+    `choice` is the chosen source index (-1 for none); None for the hedge blend.
+    """
+    support, resistance, distance = data['support'], data['resistance'], data['distance']
+    available = ~np.isnan(support) & ~np.isnan(resistance)
+    if rule == 'hedge':
+        s, r = blended_ranges(hedge_weights(distance, params), support, resistance, available)
+        return s, r, None
+    scores = window_scores(distance, params) if rule == 'window' else ewm_scores(distance, params)
+    choice = choose(scores, available)
+    s, r = selected_ranges(choice, support, resistance)
+    return s, r, choice
+
+
+def grid_search(data, grids):
+    """Score every rule over its parameter grid; returns one row per (rule, param)."""
+    import pandas as pd
+    rows = []
+    for rule, params in grids.items():
+        s, r, _ = walk_forward(data, rule, params)
+        n, hit_rate, mean_dist = score_ranges(s, r, data['market_high'][None], data['market_low'][None])
+        rows.append(pd.DataFrame({'Rule': rule, 'Param': params, 'Days_Traded': n,
+                                  'Hit_Rate_%': hit_rate.round(2), 'Avg_Distance': mean_dist.round(2)}))
+    return pd.concat(rows, ignore_index=True)
+
+
+def best_run(data, results):
+    """Re-run the best (rule, param) of `results`: (top row, s, r, choice).
+
+    With mixed rules the Param column is float, so window lengths come back as floats.
+    """
+    top = results.sort_values(['Hit_Rate_%', 'Avg_Distance'], ascending=[False, True], kind='stable').iloc[0]
+    s, r, choice = walk_forward(data, top['Rule'], [top['Param']])
+    return top, s, r, choice
+
+
+def baselines(data):
+    """Hindsight best-per-day and best fixed source, on the same days as the walk-forward."""
+    distance = data['distance']
+    within = (data['market_low'][:, None] >= data['support']) & (data['market_high'][:, None] <= data['resistance'])
+    has = ~np.isnan(distance).all(axis=1)
+    best = np.nanargmin(np.where(has[:, None], distance, np.inf), axis=1)
+    oracle_hit = within[np.arange(len(best)), best][has].mean() * 100
+    fixed_hit = within[has].mean(axis=0) * 100
+    j = int(np.argmax(fixed_hit))
+    return {'oracle_hit_rate': oracle_hit, 'best_fixed_source': data['sources'][j], 'best_fixed_hit_rate': fixed_hit[j]}
+
+
+def load_period(entry, period):
+    """Distance matrix of an instrument's source files for `period`, restricted to days with a market bar."""
+    files = source_files(entry, period)
+    nifty = OHLCStore.open(entry['ohlc'])
+    days, sources, support, resistance, market_high, market_low, distance = range_distances(files, nifty)
+    keep = ~np.isnan(market_high) & ~np.isnan(market_low) & ~np.isnan(distance).all(axis=1)
+    return {'days': days[keep], 'sources': sources, 'support': support[keep], 'resistance': resistance[keep],
+            'market_high': market_high[keep], 'market_low': market_low[keep], 'distance': distance[keep]}
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Walk-forward (no hindsight) source selection backtest')
+    p.add_argument('--prefix', default='1year', help="Period of the source files ('1year' or '3year')")
+    p.add_argument('--symbol', default=DEFAULT_SYMBOL, help='Instrument from instruments.py')
+    p.add_argument('--rule', choices=sorted(DEFAULT_GRIDS), action='append',
+                   help='Rule(s) to run (default: all)')
+    p.add_argument('--params', type=lambda t: [float(x) for x in t.split(',')], default=None,
+                   help='Comma-separated parameter grid (window length, ewm alpha or hedge eta); needs one --rule')
+    args = p.parse_args()
+    if args.params is not None and (not args.rule or len(args.rule) != 1):
+        p.error('--params needs exactly one --rule')
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    import pandas as pd
+    entry = select([args.symbol])[args.symbol.upper()]
+    data = load_period(entry, args.prefix)
+    out_prefix = symbol_prefix(args.symbol.upper(), args.prefix)
+    rules = args.rule or list(DEFAULT_GRIDS)
+    grids = {rule: args.params if args.params is not None else DEFAULT_GRIDS[rule] for rule in rules}
+    if 'window' in grids:
+        grids['window'] = [int(w) for w in grids['window']]
+
+    t0 = time.perf_counter()
+    results = grid_search(data, grids)
+    elapsed = time.perf_counter() - t0
+    out_grid = os.path.join(WORKDIR, f'{out_prefix}_walk_forward_grid.csv')
+    results.to_csv(out_grid, index=False)
+
+    # per-day detail of the best (rule, param)
+    top, s, r, choice = best_run(data, results)
+    used = 'BLEND' if choice is None else None
+    names = np.array(data['sources'] + [None], dtype=object)
+    detail = pd.DataFrame({
+        'Date': from_day_numbers(data['days']),
+        'Source_Used': used if used else names[np.where(choice[0] >= 0, choice[0], len(data['sources']))],
+        'Support': s[0], 'Resistance': r[0],
+        'Market_High': data['market_high'], 'Market_Low': data['market_low'],
+        'WithinRange': (data['market_low'] >= s[0]) & (data['market_high'] <= r[0]),
+        'Distance': np.abs(s[0] - data['market_low']) + np.abs(r[0] - data['market_high']),
+    })
+    out_detail = os.path.join(WORKDIR, f'{out_prefix}_walk_forward_detail.csv')
+    detail.to_csv(out_detail, index=False)
+
+    base = baselines(data)
+    print(f'Evaluated {len(results)} (rule, param) combinations over {len(data["days"])} days in {elapsed:.3f}s')
+    print(results.to_string(index=False))
+    print(f"\nBest walk-forward: {top['Rule']} ({top['Param']:g}) -> {top['Hit_Rate_%']:.2f}% hit rate")
+    print(f"Best fixed source (hindsight): {base['best_fixed_source']} -> {base['best_fixed_hit_rate']:.2f}%")
+    print(f"Best source per day (hindsight): {base['oracle_hit_rate']:.2f}%")
+    print(f'✅ Saved: {os.path.basename(out_grid)}, {os.path.basename(out_detail)}')